@@ -0,0 +1,121 @@
+"""
+Micro-benchmarks for classifying changelog actions and building their dedupe
+keys, comparing the single pass classifier against trying the old dispatch
+patterns one after another.
+
+    python benchmarks/changelog.py [--fixture changelog.json] [--entries N]
+
+Without a fixture a synthetic changelog with a realistic mix of actions is
+generated. A fixture is one recorded with record.py, or a JSON list of
+[name, version, timestamp, action].
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carrier import changelog
+
+
+# Roughly the mix of actions seen in the PyPI changelog
+ACTIONS = [
+    (40, lambda r: "add source file %s.tar.gz" % r),
+    (20, lambda r: "new release"),
+    (15, lambda r: "update description, classifiers"),
+    (8, lambda r: "add py2.py3 file %s-py2.py3-none-any.whl" % r),
+    (5, lambda r: "create"),
+    (4, lambda r: "remove file %s.zip" % r),
+    (3, lambda r: "remove"),
+    (3, lambda r: "docupdate"),
+    (2, lambda r: "add Owner someone"),
+]
+
+LEGACY_PATTERNS = collections.OrderedDict([
+    (re.compile("^create$"), "update"),
+    (re.compile("^new release$"), "update"),
+    (re.compile("^add [\w\d\.]+ file .+$"), "update"),
+    (re.compile("^remove$"), "delete"),
+    (re.compile("^remove file (.+)$"), "delete"),
+    (re.compile("^update [\w]+(, [\w]+)*$"), "update"),
+])
+
+
+def synthetic(entries, seed=0):
+    rand = random.Random(seed)
+    weighted = [action for weight, action in ACTIONS for _ in range(weight)]
+
+    changes = []
+
+    for i in range(entries):
+        name = "project-%s" % rand.randint(0, entries // 10)
+        version = "%s.%s" % (rand.randint(0, 5), rand.randint(0, 20))
+        changes.append([name, version, 1356998400 + i, rand.choice(weighted)("%s-%s" % (name, version))])
+
+    return changes
+
+
+def legacy_match(action):
+    for pattern, func in LEGACY_PATTERNS.iteritems():
+        matches = pattern.search(action)
+        if matches is not None:
+            return func, matches
+    return None, None
+
+
+def legacy_key(name, version, timestamp, action):
+    action_hash = hashlib.sha512(u":".join([unicode(x) for x in [name, version, timestamp, action]]).encode("utf-8")).hexdigest()[:32]
+    return "pypi:changelog:%s" % action_hash
+
+
+def measure(func, changes, repeat):
+    def run():
+        for change in changes:
+            func(change)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+
+    return {"seconds": best, "per_entry_us": best / len(changes) * 1e6}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark changelog classification")
+    parser.add_argument("--fixture", help="A fixture recorded with record.py, or a JSON changelog, to replay instead of a synthetic one")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.fixture:
+        with open(args.fixture) as fp:
+            changes = json.load(fp)
+
+        # Fixtures recorded with record.py hold the projects as well
+        if isinstance(changes, dict):
+            changes = changes["changelog"]
+    else:
+        changes = synthetic(args.entries)
+
+    results = collections.OrderedDict([
+        ("entries", len(changes)),
+        ("classify_legacy", measure(lambda c: legacy_match(c[3]), changes, args.repeat)),
+        ("classify", measure(lambda c: changelog.classify(c[3]), changes, args.repeat)),
+        ("key_legacy", measure(lambda c: legacy_key(*c), changes, args.repeat)),
+        ("key", measure(lambda c: changelog.action_key(*c), changes, args.repeat)),
+    ])
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
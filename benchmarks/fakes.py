@@ -0,0 +1,303 @@
+"""
+Stand ins for PyPI, the warehouse and the file host so that the processor can
+be benchmarked without touching the network. Each of them counts the calls
+that are made to it.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import BaseHTTPServer
+import SocketServer
+import collections
+import datetime
+import hashlib
+import threading
+import urllib
+
+
+def body(filename, size):
+    """
+    The content served for ``filename``, ``size`` bytes that depend only on
+    the filename so a fixture never has to store file bodies.
+    """
+    seed = hashlib.sha512(filename.encode("utf-8")).digest()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        # Paths look like /<size>/<filename>
+        try:
+            _, size, filename = self.path.split("/", 2)
+            content = body(urllib.unquote(filename).decode("utf-8"), int(size))
+        except ValueError:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.server.requests += 1
+        self.server.sent += len(content)
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class FileServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, *args, **kwargs):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0), _Handler, *args, **kwargs)
+
+        self.requests = 0
+        self.sent = 0
+
+        self.url = "http://127.0.0.1:%s" % self.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        return self
+
+
+class FakePyPI(object):
+    """
+    Replays the XML-RPC responses in a fixture. File urls point at ``server``
+    and their MD5 digests are replaced by those of the content it serves.
+    """
+
+    def __init__(self, fixture, server, *args, **kwargs):
+        super(FakePyPI, self).__init__(*args, **kwargs)
+
+        self.calls = collections.Counter()
+
+        self._changelog = [tuple(change) for change in fixture.get("changelog", [])]
+        self.projects = {}
+
+        for name, project in fixture["projects"].iteritems():
+            urls = {}
+
+            for version, files in project["release_urls"].iteritems():
+                urls[version] = []
+
+                for data in files:
+                    data = dict(data)
+                    data["upload_time"] = datetime.datetime.strptime(data["upload_time"], "%Y-%m-%dT%H:%M:%S")
+                    data["url"] = "%s/%s/%s" % (server.url, data["size"], urllib.quote(data["filename"].encode("utf-8")))
+                    data["md5_digest"] = hashlib.md5(body(data["filename"], data["size"])).hexdigest()
+                    urls[version].append(data)
+
+            self.projects[name] = {"releases": project["releases"], "release_data": project["release_data"], "release_urls": urls}
+
+    def _changelog_since(self, since):
+        return [list(change) for change in self._changelog if change[2] >= since]
+
+    def _package_releases(self, name, show_hidden=False):
+        return list(self.projects.get(name, {}).get("releases", []))
+
+    def _release_data(self, name, version):
+        return dict(self.projects.get(name, {}).get("release_data", {}).get(version, {}))
+
+    def _release_urls(self, name, version):
+        return [dict(data) for data in self.projects.get(name, {}).get("release_urls", {}).get(version, [])]
+
+    def changelog(self, since):
+        self.calls["changelog"] += 1
+        return self._changelog_since(since)
+
+    def package_releases(self, name, show_hidden=False):
+        self.calls["package_releases"] += 1
+        return self._package_releases(name, show_hidden)
+
+    def release_data(self, name, version):
+        self.calls["release_data"] += 1
+        return self._release_data(name, version)
+
+    def release_urls(self, name, version):
+        self.calls["release_urls"] += 1
+        return self._release_urls(name, version)
+
+    def __call__(self, method, *params):
+        if method != "system.multicall":
+            raise AttributeError(method)
+
+        # Counted as a single round trip
+        self.calls["system.multicall"] += 1
+
+        results = []
+
+        for call in params[0]:
+            results.append([getattr(self, "_%s" % call["methodName"])(*call["params"])])
+
+        return results
+
+
+class DoesNotExist(Exception):
+    pass
+
+
+class _Object(object):
+
+    def __init__(self, manager, **kwargs):
+        self.__dict__.update(kwargs)
+        self._manager = manager
+
+    def save(self):
+        self._manager.warehouse.calls["%s.save" % self._manager.kind] += 1
+
+    def delete(self):
+        self._manager.warehouse.calls["%s.delete" % self._manager.kind] += 1
+        self._manager.remove(self)
+
+    @property
+    def files(self):
+        return list(self._manager.warehouse.files.objects.by_version.get(id(self), []))
+
+
+class _QuerySet(object):
+
+    def __init__(self, manager, items):
+        self.manager = manager
+        self.resource = manager
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def get(self):
+        self.manager.warehouse.calls["%s.get" % self.manager.kind] += 1
+
+        if not self.items:
+            raise DoesNotExist()
+
+        return self.items[0]
+
+    def delete(self):
+        self.manager.warehouse.calls["%s.bulk_delete" % self.manager.kind] += 1
+
+        for item in list(self.items):
+            self.manager.remove(item)
+
+
+def _lookup(obj, key):
+    for attr in key.split("__"):
+        obj = getattr(obj, attr, None)
+    return obj
+
+
+class _Manager(object):
+
+    DoesNotExist = DoesNotExist
+
+    def __init__(self, warehouse, kind):
+        self.warehouse = warehouse
+        self.kind = kind
+        self.items = []
+        self.by_version = collections.defaultdict(list)
+
+    def _matches(self, obj, filters):
+        for key, value in filters.iteritems():
+            if key == "show_yanked":
+                continue
+            elif key.endswith("__in"):
+                if _lookup(obj, key[:-4]) not in value:
+                    return False
+            elif _lookup(obj, key) != value:
+                return False
+        return True
+
+    def _add(self, data):
+        # Read the content like the real client would when uploading it
+        if isinstance(data.get("file"), dict) and hasattr(data["file"].get("file"), "read"):
+            self.warehouse.received += len(data["file"]["file"].read())
+            data["file"] = None
+
+        obj = _Object(self, **data)
+        self.items.append(obj)
+
+        if "version" in data:
+            self.by_version[id(data["version"])].append(obj)
+
+        return obj
+
+    def remove(self, obj):
+        self.items.remove(obj)
+
+        if getattr(obj, "version", None) is not None:
+            self.by_version[id(obj.version)].remove(obj)
+
+    def filter(self, **filters):
+        self.warehouse.calls["%s.filter" % self.kind] += 1
+        return _QuerySet(self, [obj for obj in self.items if self._matches(obj, filters)])
+
+    def create(self, **data):
+        self.warehouse.calls["%s.create" % self.kind] += 1
+        return self._add(data)
+
+    def get_or_create(self, defaults=None, **filters):
+        self.warehouse.calls["%s.get_or_create" % self.kind] += 1
+
+        for obj in self.items:
+            if self._matches(obj, filters):
+                return obj, False
+
+        data = dict(defaults or {})
+        data.update([(k, v) for k, v in filters.iteritems() if "__" not in k and k != "show_yanked"])
+
+        return self._add(data), True
+
+
+class _Resource(object):
+
+    def __init__(self, manager):
+        self.objects = manager
+
+
+class _Response(object):
+
+    def raise_for_status(self):
+        pass
+
+
+class _Session(object):
+
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+
+    def post(self, url, *args, **kwargs):
+        self.warehouse.calls["post"] += 1
+        return _Response()
+
+
+class FakeWarehouse(object):
+    """
+    An in memory warehouse exposing the parts of the forklift API that the
+    processor uses.
+    """
+
+    url = "http://warehouse.invalid/v1/"
+
+    def __init__(self, *args, **kwargs):
+        super(FakeWarehouse, self).__init__(*args, **kwargs)
+
+        self.calls = collections.Counter()
+        self.received = 0
+        self.session = _Session(self)
+
+        self.projects = _Resource(_Manager(self, "projects"))
+        self.versions = _Resource(_Manager(self, "versions"))
+        self.files = _Resource(_Manager(self, "files"))
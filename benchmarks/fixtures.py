@@ -0,0 +1,128 @@
+"""
+Fixtures are JSON documents holding the XML-RPC responses for a set of
+projects and, optionally, a changelog::
+
+    {
+        "changelog": [[name, version, timestamp, action], ...],
+        "projects": {
+            name: {
+                "releases": [version, ...],
+                "release_data": {version: {...}},
+                "release_urls": {version: [{...}, ...]},
+            },
+        },
+    }
+
+They are either recorded from PyPI with ``record.py`` or generated here.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import datetime
+import json
+
+
+DESCRIPTION = "\n\n".join(["Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8] * 6)
+
+CLASSIFIERS = [
+    "Development Status :: 5 - Production/Stable",
+    "Intended Audience :: Developers",
+    "License :: OSI Approved :: BSD License",
+    "Operating System :: OS Independent",
+    "Programming Language :: Python",
+    "Programming Language :: Python :: 2.7",
+    "Topic :: Software Development :: Libraries",
+]
+
+
+def release_data(name, version):
+    return {
+        "name": name,
+        "version": version,
+        "summary": "A synthetic project for benchmarking",
+        "description": DESCRIPTION,
+        "author": "Jane Doe",
+        "author_email": "jane@example.com",
+        "license": "BSD",
+        "keywords": "benchmark, synthetic, carrier",
+        "home_page": "https://example.com/%s" % name,
+        "download_url": "UNKNOWN",
+        "classifiers": CLASSIFIERS,
+        "requires_dist": ["requests (>=0.14)", "redis (>=2.7,<3.0)", "six"],
+        "platform": "UNKNOWN",
+        "_pypi_hidden": False,
+        "_pypi_ordering": 0,
+    }
+
+
+def release_urls(name, version, files, size, uploaded):
+    urls = []
+
+    for i in range(files):
+        if i == 0:
+            filename, packagetype, python_version = "%s-%s.tar.gz" % (name, version), "sdist", "source"
+        else:
+            filename, packagetype, python_version = "%s-%s-py2.%s-none-any.whl" % (name, version, i), "bdist_wheel", "2.%s" % i
+
+        urls.append({
+            "filename": filename,
+            "packagetype": packagetype,
+            "python_version": python_version,
+            "comment_text": "",
+            "upload_time": uploaded.strftime("%Y-%m-%dT%H:%M:%S"),
+            "size": size,
+            "downloads": 0,
+            "has_sig": False,
+            "md5_digest": "",
+            "url": "",
+        })
+
+    return urls
+
+
+def synthetic(projects, versions, files, size, start=1356998400):
+    """
+    ``projects`` projects with ``versions`` versions of ``files`` files of
+    ``size`` bytes each, and a changelog that creates all of them.
+    """
+    fixture = {"changelog": [], "projects": {}}
+    timestamp = start
+
+    for p in range(projects):
+        name = "project-%s" % p
+        project = {"releases": [], "release_data": {}, "release_urls": {}}
+
+        fixture["changelog"].append([name, None, timestamp, "create"])
+
+        for v in range(versions):
+            version = "%s.%s" % (v // 10, v % 10)
+            uploaded = datetime.datetime.utcfromtimestamp(timestamp)
+
+            project["releases"].append(version)
+            project["release_data"][version] = release_data(name, version)
+            project["release_urls"][version] = release_urls(name, version, files, size, uploaded)
+
+            fixture["changelog"].append([name, version, timestamp, "new release"])
+
+            for data in project["release_urls"][version]:
+                fixture["changelog"].append([name, version, timestamp, "add %s file %s" % (data["python_version"], data["filename"])])
+
+            timestamp += 1
+
+        # PyPI lists the newest release first
+        project["releases"].reverse()
+
+        fixture["projects"][name] = project
+
+    return fixture
+
+
+def load(path):
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def save(fixture, path):
+    with open(path, "w") as fp:
+        json.dump(fixture, fp, indent=1, sort_keys=True)
@@ -0,0 +1,140 @@
+"""
+Micro-benchmarks for parsing the requirements and urls in release metadata,
+comparing the memoized split_meta and clean_uri against parsing every time.
+
+    python benchmarks/parsing.py [--fixture recorded.json]
+
+Without a fixture a corpus is generated where, like on PyPI, most versions of
+a project share their requirements and urls.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+from carrier import utils
+
+
+URL_KEYS = ["home_page", "download_url", "bugtrack_url", "docs_url"]
+
+DEPENDENCIES = ["requests", "six", "redis", "Django", "SQLAlchemy", "lxml", "pytz", "python-dateutil", "simplejson", "Jinja2"]
+
+
+def synthetic(projects=300, versions=20, seed=0):
+    rand = random.Random(seed)
+    releases = []
+
+    for p in range(projects):
+        name = "project-%s" % p
+        requires = ["%s (>=%s.%s)" % (dep, rand.randint(0, 3), rand.randint(0, 9)) for dep in rand.sample(DEPENDENCIES, 4)]
+
+        for v in range(versions):
+            # Now and then a version bumps one of its requirements
+            if rand.random() < 0.2:
+                requires[rand.randrange(len(requires))] = "%s (>=%s.0,<%s.0); python_version < '3'" % (rand.choice(DEPENDENCIES), v, v + 1)
+
+            releases.append({
+                "requires_dist": list(requires),
+                "home_page": "https://github.com/example/%s" % name,
+                "bugtrack_url": "https://github.com/example/%s/issues" % name,
+                "download_url": "UNKNOWN" if v % 2 else "https://pypi.python.org/packages/source/%s/%s-%s.tar.gz" % (name[0], name, v),
+                "project_url": ["Documentation, https://%s.readthedocs.org/en/%s/" % (name, v // 5)],
+            })
+
+    return releases
+
+
+def corpus(releases):
+    requirements, urls = [], []
+
+    for data in releases:
+        for key in ["requires_dist", "provides_dist", "obsoletes_dist"]:
+            requirements.extend(data.get(key) or [])
+
+        for key in URL_KEYS:
+            if data.get(key) and data[key] != "UNKNOWN":
+                urls.append(data[key])
+
+        for purl in data.get("project_url") or []:
+            urls.append(purl.split(",", 1)[-1])
+
+    return requirements, urls
+
+
+def measure(func, items, repeat, clear=None):
+    # Every run starts with an empty cache so filling it is counted too
+    def run():
+        if clear is not None:
+            clear()
+
+        for item in items:
+            try:
+                func(item)
+            except ValueError:
+                pass
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+
+    return {"seconds": best, "per_item_us": best / len(items) * 1e6 if items else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parsing requirements and urls")
+    parser.add_argument("--fixture", help="A fixture recorded with record.py to take the metadata from")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.fixture:
+        fixture = fixtures.load(args.fixture)
+        releases = [data for project in fixture["projects"].values() for data in project["release_data"].values()]
+    else:
+        releases = synthetic()
+
+    requirements, urls = corpus(releases)
+
+    def split_meta_uncached(meta):
+        return dict(zip(utils.Meta._fields, utils._split_meta.uncached(meta)))
+
+    results = collections.OrderedDict([
+        ("releases", len(releases)),
+        ("requirements", len(requirements)),
+        ("distinct_requirements", len(set(requirements))),
+        ("urls", len(urls)),
+        ("distinct_urls", len(set(urls))),
+    ])
+
+    def clear():
+        utils._parse_predicate.cache_clear()
+        utils._split_meta.cache_clear()
+        utils.clean_uri.cache_clear()
+
+    with_uncached_predicates = utils._parse_predicate
+    utils._parse_predicate = utils._parse_predicate.uncached
+
+    try:
+        results["split_meta_uncached"] = measure(split_meta_uncached, requirements, args.repeat)
+    finally:
+        utils._parse_predicate = with_uncached_predicates
+
+    results["split_meta"] = measure(utils.split_meta, requirements, args.repeat, clear)
+    results["clean_uri_uncached"] = measure(utils.clean_uri.uncached, urls, args.repeat)
+    results["clean_uri"] = measure(utils.clean_uri, urls, args.repeat, clear)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Records the XML-RPC responses PyPI gives for some projects into a fixture that
+the benchmarks can replay.
+
+    python benchmarks/record.py fixture.json --project Django --project six
+    python benchmarks/record.py fixture.json --changelog 3600
+
+With ``--changelog`` the changelog for the last that many seconds is recorded
+along with every project it mentions.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import os
+import sys
+import time
+import xmlrpclib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+
+def _convert(value):
+    if hasattr(value, "timetuple"):
+        return time.strftime("%Y-%m-%dT%H:%M:%S", value.timetuple())
+    elif isinstance(value, dict):
+        return dict([(k, _convert(v)) for k, v in value.iteritems()])
+    elif isinstance(value, (list, tuple)):
+        return [_convert(v) for v in value]
+    return value
+
+
+def record_project(client, name):
+    project = {"releases": [], "release_data": {}, "release_urls": {}}
+    project["releases"] = client.package_releases(name, True)
+
+    for version in project["releases"]:
+        project["release_data"][version] = _convert(client.release_data(name, version))
+        project["release_urls"][version] = _convert(client.release_urls(name, version))
+
+    return project
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record PyPI XML-RPC responses into a fixture")
+    parser.add_argument("output")
+    parser.add_argument("--uri", default="https://pypi.python.org/pypi")
+    parser.add_argument("--project", action="append", default=[])
+    parser.add_argument("--changelog", type=int, help="Record the changelog for the last CHANGELOG seconds")
+    args = parser.parse_args(argv)
+
+    client = xmlrpclib.ServerProxy(args.uri, use_datetime=True)
+
+    fixture = {"changelog": [], "projects": {}}
+    names = list(args.project)
+
+    if args.changelog:
+        fixture["changelog"] = [list(change) for change in client.changelog(int(time.time()) - args.changelog)]
+        names.extend(sorted(set([change[0] for change in fixture["changelog"]]) - set(names)))
+
+    for name in names:
+        print("Recording %s" % name)
+        fixture["projects"][name] = record_project(client, name)
+
+    fixtures.save(fixture, args.output)
+
+
+if __name__ == "__main__":
+    main()
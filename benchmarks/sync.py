@@ -0,0 +1,229 @@
+"""
+End to end benchmarks of ``Processor.update`` and ``Processor.process``
+against recorded or synthetic PyPI responses, a fake warehouse, fakeredis and
+a local file server.
+
+    python benchmarks/sync.py [--output results.json] [--fixture recorded.json]
+    python benchmarks/sync.py --compare before.json after.json
+
+Every scenario runs in its own process so that its peak memory can be
+measured. Results are written as JSON, tagged with the commit they were made
+at, so that runs from different commits can be compared.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import collections
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakeredis
+
+import fakes
+import fixtures
+
+from carrier.processor import Processor
+
+
+# name: (projects, versions, files per version, file size)
+SCENARIOS = collections.OrderedDict([
+    ("small", (1, 5, 2, 16 * 1024)),
+    ("large", (1, 100, 4, 64 * 1024)),
+    ("huge", (1, 1000, 3, 8 * 1024)),
+    ("changelog", (200, 3, 2, 16 * 1024)),
+])
+
+
+def maxrss():
+    # Kilobytes on Linux, bytes on OS X
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def _releases(fixture):
+    return sum([len(project["releases"]) for project in fixture["projects"].values()])
+
+
+class Run(object):
+
+    def __init__(self, fixture, pypi_workers=1, process_workers=1, pypi_batch=1, *args, **kwargs):
+        super(Run, self).__init__(*args, **kwargs)
+
+        self.fixture = fixture
+
+        self.server = fakes.FileServer().start()
+        self.pypi = fakes.FakePyPI(fixture, self.server)
+        self.warehouse = fakes.FakeWarehouse()
+        self.store = fakeredis.FakeStrictRedis()
+        self.store.flushall()
+
+        self.processor = Processor(self.warehouse, self.pypi, self.store, pypi_workers=pypi_workers, process_workers=process_workers, pypi_batch=pypi_batch)
+
+    def measure(self, func, releases):
+        pypi_calls = sum(self.pypi.calls.values())
+        warehouse_calls = sum(self.warehouse.calls.values())
+        requests = self.server.requests
+        sent = self.server.sent
+
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+
+        releases = max(releases, 1)
+
+        return collections.OrderedDict([
+            ("seconds", elapsed),
+            ("releases_per_second", releases / elapsed if elapsed else None),
+            ("pypi_calls_per_release", (sum(self.pypi.calls.values()) - pypi_calls) / releases),
+            ("warehouse_calls_per_release", (sum(self.warehouse.calls.values()) - warehouse_calls) / releases),
+            ("downloads", self.server.requests - requests),
+            ("downloaded_bytes", self.server.sent - sent),
+            ("maxrss_kb", maxrss()),
+        ])
+
+    def update(self):
+        releases = _releases(self.fixture)
+
+        def run():
+            for name in self.fixture["projects"]:
+                self.processor.update(name)
+
+        return collections.OrderedDict([
+            ("releases", releases),
+            ("cold", self.measure(run, releases)),
+            ("warm", self.measure(run, releases)),
+        ])
+
+    def process(self):
+        releases = _releases(self.fixture)
+        changelog = self.fixture["changelog"]
+
+        self.store.set("pypi:since", min([change[2] for change in changelog]) + 10 if changelog else 0)
+
+        return collections.OrderedDict([
+            ("releases", releases),
+            ("changes", len(changelog)),
+            ("process", self.measure(self.processor.process, releases)),
+        ])
+
+
+def run_scenario(name, fixture_path=None, pypi_workers=1, process_workers=1, pypi_batch=1):
+    if fixture_path is not None:
+        fixture = fixtures.load(fixture_path)
+    else:
+        fixture = fixtures.synthetic(*SCENARIOS[name])
+
+    result = collections.OrderedDict([("baseline_maxrss_kb", maxrss())])
+
+    if fixture["changelog"] and len(fixture["projects"]) > 1:
+        result.update(Run(fixture, pypi_workers, process_workers, pypi_batch).process())
+    else:
+        result.update(Run(fixture, pypi_workers, process_workers, pypi_batch).update())
+
+    return result
+
+
+def commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before, after):
+    # Prints the change of every timing, call count and memory figure
+    def flatten(data, prefix=""):
+        for key, value in data.iteritems():
+            if isinstance(value, dict):
+                for item in flatten(value, "%s%s." % (prefix, key)):
+                    yield item
+            elif isinstance(value, (int, long, float)) and not isinstance(value, bool):
+                yield "%s%s" % (prefix, key), value
+
+    old = dict(flatten(before["results"]))
+    new = dict(flatten(after["results"]))
+
+    print("%-60s %14s %14s %8s" % ("%s -> %s" % (before["commit"], after["commit"]), "before", "after", "change"))
+
+    for key in sorted(set(old) & set(new)):
+        change = "%+.1f%%" % ((new[key] - old[key]) / old[key] * 100) if old[key] else ""
+        print("%-60s %14.4f %14.4f %8s" % (key, old[key], new[key], change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark syncing projects from PyPI into the warehouse")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS) + ["recorded"])
+    parser.add_argument("--fixture", help="A fixture recorded with record.py, run as the 'recorded' scenario")
+    parser.add_argument("--pypi-workers", type=int, default=1)
+    parser.add_argument("--process-workers", type=int, default=1)
+    parser.add_argument("--pypi-batch", type=int, default=1)
+    parser.add_argument("--output", help="Write the results to this file as well")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("carrier").setLevel(logging.CRITICAL)
+
+    if args.compare:
+        before, after = [fixtures.load(path) for path in args.compare]
+        compare(before, after)
+        return
+
+    if args.child:
+        result = run_scenario(args.scenario[0], args.fixture, args.pypi_workers, args.process_workers, args.pypi_batch)
+        print(json.dumps(result))
+
+        # Don't wait on the file server's keep alive connections
+        sys.stdout.flush()
+        os._exit(0)
+
+    scenarios = args.scenario or list(SCENARIOS)
+
+    if args.fixture and "recorded" not in scenarios:
+        scenarios.append("recorded")
+
+    results = collections.OrderedDict([
+        ("commit", commit()),
+        ("python", platform.python_version()),
+        ("pypi_workers", args.pypi_workers),
+        ("process_workers", args.process_workers),
+        ("pypi_batch", args.pypi_batch),
+        ("results", collections.OrderedDict()),
+    ])
+
+    for scenario in scenarios:
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--scenario", scenario,
+                    "--pypi-workers", str(args.pypi_workers), "--process-workers", str(args.process_workers),
+                    "--pypi-batch", str(args.pypi_batch)]
+
+        if scenario == "recorded":
+            command.extend(["--fixture", args.fixture])
+
+        results["results"][scenario] = json.loads(subprocess.check_output(command), object_pairs_hook=collections.OrderedDict)
+
+    output = json.dumps(results, indent=4)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(output)
+
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,36 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import argparse
+import sys
+
 from .core import Carrier
 
 
-def main():
-    Carrier().run()
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="carrier", description="Warehouse and PyPI Synchronization")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "produce", "consume", "bulk", "migrate"],
+                        help="run keeps the warehouse synchronized (the default), produce and consume do the same split across processes using a Redis queue, bulk imports every package from PyPI, migrate converts stored state from older versions")
+    parser.add_argument("--workers", type=int, help="number of worker processes to use for bulk")
+    parser.add_argument("--queue", action="store_true", help="have bulk add every package to the work queue instead, to be synced by the consumers behind the changelog")
+    parser.add_argument("--engine", choices=["scheduler", "continuous"], help="how run synchronizes, overriding the ENGINE setting")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "produce":
+        Carrier().produce()
+    elif args.command == "consume":
+        Carrier().consume()
+    elif args.command == "bulk":
+        from .tasks.bulk import bulk
+
+        # Let whatever runs it know when packages failed to synchronize
+        sys.exit(0 if bulk(workers=args.workers, queue=args.queue) else 1)
+    elif args.command == "migrate":
+        from .tasks.migrate import migrate
+        migrate()
+    else:
+        Carrier().run(engine=args.engine)
 
 
 if __name__ == "__main__":
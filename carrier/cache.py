@@ -0,0 +1,319 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import datetime
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class FileCache(object):
+    """
+    A content addressed cache of verified distributions on disk. Files are
+    keyed by their MD5 digest, written atomically, and the least recently
+    used ones are evicted once the cache grows past ``max_size`` bytes.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path, max_size, *args, **kwargs):
+        super(FileCache, self).__init__(*args, **kwargs)
+
+        self.path = path
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._size = None
+
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _path(self, digest):
+        return os.path.join(self.path, digest[:2], digest)
+
+    def get(self, digest):
+        """
+        Returns an open file and its digests for the file cached under
+        ``digest``, or ``None`` if it is not cached or no longer matches.
+        """
+        path = self._path(digest)
+
+        try:
+            fp = open(path, "rb")
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+
+        for chunk in iter(lambda: fp.read(self.chunk_size), b""):
+            md5.update(chunk)
+            sha256.update(chunk)
+
+        if md5.hexdigest() != digest:
+            logger.warning("Removing the corrupted cache file '%s'", path)
+            fp.close()
+            self._remove(path)
+            return None
+
+        # Mark the file as recently used
+        os.utime(path, None)
+
+        fp.seek(0)
+
+        return fp, {"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}
+
+    def writer(self):
+        """
+        Returns a temporary file inside the cache to write a download to, it
+        becomes part of the cache once passed to :meth:`commit`.
+        """
+        return tempfile.NamedTemporaryFile(dir=self.path, prefix=".tmp-", delete=False)
+
+    def commit(self, fp, digest):
+        """
+        Atomically moves the verified file written to ``fp`` into the cache
+        and returns it opened for reading.
+        """
+        fp.flush()
+        os.fsync(fp.fileno())
+        fp.close()
+
+        path = self._path(digest)
+
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        os.rename(fp.name, path)
+
+        data = open(path, "rb")
+
+        self._added(os.fstat(data.fileno()).st_size)
+
+        return data
+
+    def discard(self, fp):
+        fp.close()
+        self._remove(fp.name)
+
+    def _added(self, size):
+        with self._lock:
+            # Other processes may share the cache, so the real size is only
+            #   measured when the running estimate says we're over the limit.
+            if self._size is None:
+                self._size = self._measure()[0]
+            else:
+                self._size += size
+
+            if self._size > self.max_size:
+                self._size = self._evict()
+
+    def _measure(self):
+        total, entries = 0, []
+
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+
+                path = os.path.join(dirpath, filename)
+
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                total += stat.st_size
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        return total, entries
+
+    def _evict(self):
+        total, entries = self._measure()
+
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            logger.debug("Evicting '%s' from the cache", path)
+
+            self._remove(path)
+            total -= size
+
+        return total
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+def _encode(obj):
+    if isinstance(obj, datetime.datetime):
+        return {"__datetime__": obj.strftime("%Y-%m-%dT%H:%M:%S.%f")}
+    raise TypeError("%r is not JSON serializable" % obj)
+
+
+def _decode(obj):
+    if "__datetime__" in obj:
+        return datetime.datetime.strptime(obj["__datetime__"], "%Y-%m-%dT%H:%M:%S.%f")
+    return obj
+
+
+class MetadataCache(object):
+    """
+    Caches the XML-RPC responses PyPI gives for a project in Redis, in a
+    ``pypi:cache:<name>`` hash holding its list of releases and the
+    release_data and release_urls of each version. Only the ``max_projects``
+    most recently used projects are kept, and each entry expires ``ttl``
+    seconds after it was fetched in case a change never shows up in the
+    changelog.
+    """
+
+    index = "pypi:cache"
+
+    def __init__(self, store, max_projects, ttl=None, *args, **kwargs):
+        super(MetadataCache, self).__init__(*args, **kwargs)
+
+        self.store = store
+        self.max_projects = max_projects
+        self.ttl = ttl
+
+    def _key(self, name):
+        return "pypi:cache:%s" % name
+
+    def _dump(self, value):
+        # Every entry is stored along with when it was fetched so that it
+        #   expires on its own, writes to the project don't keep it alive.
+        return "%.3f:%s" % (time.time(), json.dumps(value, default=_encode))
+
+    def _load(self, raw):
+        if raw is None:
+            return None
+
+        fetched, _, value = raw.partition(b":")
+
+        try:
+            fetched = float(fetched)
+        except ValueError:
+            # Cached before entries were timestamped
+            return None
+
+        if self.ttl and time.time() - fetched > self.ttl:
+            return None
+
+        return json.loads(value, object_hook=_decode)
+
+    def releases(self, name):
+        releases = self._load(self.store.hget(self._key(name), "releases"))
+
+        if releases is None:
+            return None
+
+        self.store.zadd(self.index, time.time(), name)
+
+        return releases
+
+    def set_releases(self, name, releases):
+        self._set(name, {"releases": self._dump(releases)})
+
+    def get(self, name, versions):
+        """
+        Returns a dict mapping each cached version to its ``(release_data,
+        release_urls)``.
+        """
+        if not versions:
+            return {}
+
+        fields = []
+
+        for version in versions:
+            fields.extend(["data:%s" % version, "urls:%s" % version])
+
+        values = self.store.hmget(self._key(name), fields)
+
+        cached = {}
+
+        for version, data, urls in zip(versions, values[::2], values[1::2]):
+            data, urls = self._load(data), self._load(urls)
+
+            if data is not None and urls is not None:
+                cached[version] = (data, urls)
+
+        return cached
+
+    def set(self, name, releases):
+        """
+        Caches the ``(release_data, release_urls)`` of each version in the
+        ``releases`` dict.
+        """
+        mapping = {}
+
+        for version, (data, urls) in releases.iteritems():
+            mapping["data:%s" % version] = self._dump(data)
+            mapping["urls:%s" % version] = self._dump(urls)
+
+        self._set(name, mapping)
+
+    def _set(self, name, mapping):
+        if not mapping:
+            return
+
+        pipe = self.store.pipeline()
+        pipe.hmset(self._key(name), mapping)
+
+        # Only drops the projects that stop being synced, entries expire on
+        #   their own.
+        if self.ttl:
+            pipe.expire(self._key(name), self.ttl)
+
+        pipe.zadd(self.index, time.time(), name)
+        pipe.zcard(self.index)
+
+        size = pipe.execute()[-1]
+
+        if size > self.max_projects:
+            self._evict(size - self.max_projects)
+
+    def _evict(self, count):
+        names = self.store.zrange(self.index, 0, count - 1)
+
+        if names:
+            pipe = self.store.pipeline()
+            pipe.delete(*[self._key(name.decode("utf-8")) for name in names])
+            pipe.zrem(self.index, *names)
+            pipe.execute()
+
+    def invalidate(self, changes):
+        """
+        Drops what is cached for the projects and versions that ``changes``,
+        a list of changelog entries, touch.
+        """
+        pipe = self.store.pipeline(transaction=False)
+
+        for name, version, timestamp, action in changes:
+            if version is None:
+                pipe.delete(self._key(name))
+            else:
+                pipe.hdel(self._key(name), "releases", "data:%s" % version, "urls:%s" % version)
+
+        pipe.execute()
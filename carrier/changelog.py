@@ -0,0 +1,64 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import hashlib
+import re
+
+
+Event = collections.namedtuple("Event", ["kind", "filename", "fields"])
+
+
+# Every action PyPI records that we know about, as one alternation so that an
+#   action is classified in a single match. The name of the group that matched
+#   is the kind of the event.
+_ACTION = re.compile(
+    r"^(?:"
+    r"(?P<create>create)"
+    r"|(?P<release>new release)"
+    r"|add [\w\d\.]+ file (?P<add_file>.+)"
+    r"|(?P<remove>remove)"
+    r"|remove file (?P<remove_file>.+)"
+    r"|update (?P<update>[\w]+(?:, [\w]+)*)"
+    r"|(?P<docupdate>docupdate)"
+    r"|add (?:Owner|Maintainer) (?P<add_role>.+)"
+    r"|remove (?:Owner|Maintainer) (?P<remove_role>.+)"
+    r")$"
+)
+
+CREATE = "create"
+RELEASE = "release"
+ADD_FILE = "add_file"
+REMOVE = "remove"
+REMOVE_FILE = "remove_file"
+UPDATE = "update"
+DOCUPDATE = "docupdate"
+ADD_ROLE = "add_role"
+REMOVE_ROLE = "remove_role"
+
+
+def classify(action):
+    """
+    Turns a changelog action into an ``Event``, or ``None`` if the action
+    isn't one we know about.
+    """
+    match = _ACTION.match(action)
+
+    if match is None:
+        return None
+
+    kind = match.lastgroup
+    filename, fields = None, ()
+
+    if kind in (ADD_FILE, REMOVE_FILE):
+        filename = match.group(kind)
+    elif kind == UPDATE:
+        fields = tuple(match.group(kind).split(", "))
+
+    return Event(kind, filename, fields)
+
+
+def action_key(name, version, timestamp, action):
+    data = "%s:%s:%s:%s" % (name, version, timestamp, action)
+    return "pypi:changelog:%s" % hashlib.md5(data.encode("utf-8")).hexdigest()
@@ -1,14 +1,93 @@
 import os
 
+# Either "scheduler", which runs a full synchronization on the SCHEDULE, or
+#   "continuous", which polls the changelog every CONTINUOUS_INTERVAL seconds
+#   and syncs projects on PROCESS_WORKERS threads as their changes come in.
+ENGINE = "scheduler"
+
 SCHEDULE = {
     "packages": {"seconds": 30},
 }
 
+CONTINUOUS_INTERVAL = 5
+
+# The Redis work queue used by "carrier produce" and "carrier consume". The
+#   producer polls the changelog every INTERVAL seconds. Failed work is retried
+#   RETRIES times, waiting BACKOFF seconds and doubling that each time. A
+#   consumer that hasn't sent a heartbeat (every HEARTBEAT seconds) for TIMEOUT
+#   seconds is considered dead and its work is put back on the queue.
+QUEUE = {
+    "INTERVAL": 5,
+    "RETRIES": 5,
+    "BACKOFF": 30,
+    "HEARTBEAT": 30,
+    "TIMEOUT": 300,
+}
+
+# Changes that fail while processing the changelog are skipped and retried
+#   with a later batch, up to RETRIES times, waiting BACKOFF seconds and
+#   doubling that each time.
+FAILURES = {
+    "RETRIES": 10,
+    "BACKOFF": 60,
+}
+
+# Number of projects from the changelog to process concurrently
+PROCESS_WORKERS = 1
+
+# Number of processes used to import every project with "carrier bulk"
+BULK_WORKERS = 8
+
+# Counters, gauges and latency histograms for PyPI, warehouse, Redis and file
+#   transfers, and how far the last checkpoint is behind the changelog. Set
+#   PROMETHEUS to {"HOST": ..., "PORT": ...} to serve them at /metrics, and/or
+#   STATSD to {"HOST": ..., "PORT": ..., "PREFIX": ...} to send them to StatsD.
+METRICS = {
+    "PROMETHEUS": None,
+    "STATSD": None,
+}
+
 WAREHOUSE_URI = "https://api.crate.io/v1/"
 
 PYPI_URI = "https://pypi.python.org/pypi"
 PYPI_SSL_VERIFY = os.path.join(os.path.dirname(__file__), "pypi.crt")
 
+# Number of versions of a project to fetch from PyPI concurrently
+PYPI_WORKERS = 1
+
+# Number of versions of a project to fetch the metadata of in a single
+#   system.multicall request, 1 makes a request per call instead. Batches are
+#   fetched PYPI_WORKERS at a time.
+PYPI_BATCH_SIZE = 1
+
+# Shared by every connection made to PyPI and to the Warehouse. POOL_MAXSIZE is
+#   the number of connections kept alive per host, it is raised automatically
+#   to cover PYPI_WORKERS * PROCESS_WORKERS. Idempotent requests are retried
+#   RETRIES times, waiting BACKOFF seconds and doubling that each time.
+HTTP = {
+    "POOL_CONNECTIONS": 10,
+    "POOL_MAXSIZE": 10,
+    "TIMEOUT": 60,
+    "RETRIES": 3,
+    "BACKOFF": 1,
+}
+
+# On disk cache of downloaded distributions, disabled unless PATH is set.
+#   MAX_SIZE is in bytes.
+CACHE = {
+    "PATH": None,
+    "MAX_SIZE": 10 * 1024 * 1024 * 1024,
+}
+
+# Cache of PyPI's XML-RPC responses in Redis, disabled unless MAX_PROJECTS is
+#   set. Entries are dropped when the changelog mentions their project and
+#   version, only the MAX_PROJECTS most recently used projects are kept, and
+#   everything expires after TTL seconds.
+METADATA_CACHE = {
+    "MAX_PROJECTS": None,
+    "TTL": 24 * 60 * 60,
+}
+
 REDIS = {}  # We leave this empty so client defaults occur
 
 LOGGING = {
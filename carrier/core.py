@@ -9,14 +9,17 @@ import time
 
 import forklift
 import redis
-import requests
 import xmlrpc2.client
 
 from apscheduler.scheduler import Scheduler
 
+from . import metrics
+from .cache import FileCache, MetadataCache
 from .config import Config, defaults
+from .engine import ContinuousEngine
+from .workqueue import WorkQueue
 from .processor import Processor
-from .utils import user_agent
+from .sessions import session
 
 
 logger = logging.getLogger(__name__)
@@ -36,26 +39,98 @@ class Carrier(object):
 
         # Initalize app
         logging.config.dictConfig(self.config["LOGGING"])
+        metrics.configure(self.config)
 
         store = redis.StrictRedis(**dict([(k.lower(), v) for k, v in self.config["REDIS"].items()]))
 
-        wsession = requests.session(
+        # Every worker thread may hold a connection at the same time
+        pool_maxsize = self.config["PYPI_WORKERS"] * self.config["PROCESS_WORKERS"]
+
+        wsession = session(self.config,
+                        name="warehouse",
+                        pool_maxsize=pool_maxsize,
                         auth=(
                             self.config["WAREHOUSE_AUTH"]["USERNAME"],
                             self.config["WAREHOUSE_AUTH"]["PASSWORD"],
                         ),
-                        headers={"User-Agent": user_agent()},
                     )
         warehouse = forklift.Forklift(session=wsession)
         warehouse.url = self.config["WAREHOUSE_URI"]
 
-        psession = requests.session(verify=self.config["PYPI_SSL_VERIFY"], headers={"User-Agent": user_agent()})
+        # The XML-RPC calls made to PyPI are all read only and safe to retry
+        psession = session(self.config,
+                        name="pypi",
+                        pool_maxsize=pool_maxsize,
+                        verify=self.config["PYPI_SSL_VERIFY"],
+                        retry_methods=("GET", "HEAD", "OPTIONS", "POST"),
+                    )
         ptransports = [xmlrpc2.client.HTTPTransport(session=psession), xmlrpc2.client.HTTPSTransport(session=psession)]
         pypi = xmlrpc2.client.Client(self.config["PYPI_URI"], transports=ptransports)
 
-        self.processor = Processor(warehouse, pypi, store)
+        if self.config["CACHE"].get("PATH") is not None:
+            cache = FileCache(self.config["CACHE"]["PATH"], self.config["CACHE"]["MAX_SIZE"])
+        else:
+            cache = None
+
+        if self.config["METADATA_CACHE"].get("MAX_PROJECTS"):
+            metadata = MetadataCache(store, self.config["METADATA_CACHE"]["MAX_PROJECTS"], self.config["METADATA_CACHE"]["TTL"])
+        else:
+            metadata = None
+
+        self.processor = Processor(warehouse, pypi, store,
+                            pypi_workers=self.config["PYPI_WORKERS"],
+                            pypi_batch=self.config["PYPI_BATCH_SIZE"],
+                            process_workers=self.config["PROCESS_WORKERS"],
+                            session=psession,
+                            cache=cache,
+                            metadata=metadata,
+                            retries=self.config["FAILURES"]["RETRIES"],
+                            backoff=self.config["FAILURES"]["BACKOFF"],
+                        )
+
+    def run(self, engine=None):
+        if engine is None:
+            engine = self.config["ENGINE"]
+
+        if engine == "continuous":
+            self.run_continuous()
+        elif engine == "scheduler":
+            self.run_scheduler()
+        else:
+            raise ValueError("Unknown engine '%s'" % engine)
+
+    def run_continuous(self):
+        engine = ContinuousEngine(self.processor,
+                    workers=self.config["PROCESS_WORKERS"],
+                    interval=self.config["CONTINUOUS_INTERVAL"],
+                )
+
+        try:
+            engine.run()
+        except KeyboardInterrupt:
+            logger.info("Shutting down Carrier...")
+
+    def queue(self):
+        return WorkQueue(self.processor,
+                    retries=self.config["QUEUE"]["RETRIES"],
+                    backoff=self.config["QUEUE"]["BACKOFF"],
+                    heartbeat=self.config["QUEUE"]["HEARTBEAT"],
+                    timeout=self.config["QUEUE"]["TIMEOUT"],
+                )
+
+    def produce(self):
+        try:
+            self.queue().run_producer(interval=self.config["QUEUE"]["INTERVAL"])
+        except KeyboardInterrupt:
+            logger.info("Shutting down Carrier...")
+
+    def consume(self):
+        try:
+            self.queue().run_consumer()
+        except KeyboardInterrupt:
+            logger.info("Shutting down Carrier...")
 
-    def run(self):
+    def run_scheduler(self):
         scheduler = Scheduler()
 
         if self.config["SCHEDULE"].get("packages") is not None:
@@ -0,0 +1,234 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import datetime
+import itertools
+import logging
+import Queue
+import threading
+import time
+
+from . import scheduling
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContinuousEngine(object):
+    """
+    Keeps the warehouse synchronized by polling the changelog in a loop and
+    handing each project's work to a pool of worker threads, instead of
+    running :meth:`Processor.process` as a whole on a fixed schedule.
+
+    A poll never waits for earlier work to finish so new changes are picked
+    up while slow projects are still syncing. Each project only has one
+    unit of work running at a time so its changes still apply in order, and
+    ``pypi:since`` only advances past changes once they have completed.
+
+    Projects with new uploads are handed to the workers ahead of projects
+    with only other changes, so a new release doesn't wait behind a backlog.
+
+    Changes that fail are retried from ``pypi:failed`` with a backoff, the
+    same as with :meth:`Processor.process`, so they don't hold back
+    ``pypi:since`` while they wait. The later changes of their project wait
+    there with them.
+    """
+
+    def __init__(self, processor, workers=1, interval=5, *args, **kwargs):
+        super(ContinuousEngine, self).__init__(*args, **kwargs)
+
+        self.processor = processor
+        self.workers = workers
+        self.interval = interval
+
+        # Holds (priority, sequence, name, work), the sequence keeps projects
+        #   of the same priority in the order they were queued.
+        self.queue = Queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+
+        # Changes that are queued or running mapped to their timestamps, and
+        #   those left over when processing a project broke off mapped to
+        #   their timestamps and the poll it happened during so the next poll
+        #   can pick them up again.
+        self.outstanding = {}
+        self.deferred = {}
+        self.polls = 0
+
+        self.checkpointed = None
+
+        # Projects with work queued or running, mapped to the work waiting
+        #   for that to finish.
+        self.projects = {}
+
+        # Projects with a change that failed, mapped to when it is retried
+        self.blocked = {}
+
+    def run(self):
+        for _ in range(self.workers):
+            worker = threading.Thread(target=self.work)
+            worker.daemon = True
+            worker.start()
+
+        while True:
+            started = time.time()
+
+            try:
+                self.poll()
+            except Exception as e:
+                logger.exception(str(e))
+
+            time.sleep(max(0, self.interval - (time.time() - started)))
+
+    def poll(self):
+        with self.lock:
+            self.polls += 1
+            poll = self.polls
+
+        since = self.processor.since()
+
+        current = datetime.datetime.utcnow().replace(microsecond=0)
+
+        with self.lock:
+            running = set(self.outstanding)
+
+        changes = self.processor.merge_failed(self.processor.changes(since), running)
+
+        with self.lock:
+            # Anything deferred before this poll started is either in changes
+            #   again or was processed after all.
+            for key, (timestamp, deferred_poll) in self.deferred.items():
+                if deferred_poll < poll:
+                    del self.deferred[key]
+
+            changes = [c for c in changes if self.processor.action_key(*c) not in self.outstanding]
+
+            # Projects which had a change fail since their failures were read
+            for name, retry in self.blocked.items():
+                if retry <= time.time():
+                    del self.blocked[name]
+
+            held = [c for c in changes if c[0] in self.blocked]
+
+            if held:
+                changes = [c for c in changes if c[0] not in self.blocked]
+
+                for name in set([change[0] for change in held]):
+                    self._hold([change for change in held if change[0] == name], self.blocked[name])
+
+            for change in changes:
+                self.outstanding[self.processor.action_key(*change)] = change[2]
+
+            work = self.processor.coalesce(changes)
+
+            for name, partition in self.processor.partition(work).items():
+                if name in self.projects:
+                    self.projects[name].append(partition)
+                else:
+                    self.projects[name] = collections.deque()
+                    self.put(name, partition)
+
+            pending = self.outstanding.values() + [timestamp for timestamp, _ in self.deferred.values()]
+
+        if work:
+            logger.info("Queued %s changes as %s units of work", len(changes), len(work))
+
+        # Only move past changes once everything before them has completed
+        if pending:
+            current = datetime.datetime.fromtimestamp(min(pending))
+
+        if current != self.checkpointed:
+            self.processor.checkpoint(current)
+            self.checkpointed = current
+
+    def put(self, name, partition):
+        self.queue.put((scheduling.partition_priority(partition), next(self.sequence), name, partition))
+
+    def complete(self, changes):
+        pipe = self.processor.store.pipeline()
+
+        with self.lock:
+            for change in changes:
+                key = self.processor.action_key(*change)
+
+                pipe.hdel("pypi:failed", key)
+                self.outstanding.pop(key, None)
+
+            pipe.execute()
+
+    def fail(self, changes):
+        pipe = self.processor.store.pipeline()
+
+        with self.lock:
+            retry = self.processor.record_failed(pipe, changes)
+            pipe.execute()
+
+            if retry is not None:
+                self.blocked[changes[0][0]] = retry
+
+            # They are retried from pypi:failed so they no longer hold back
+            #   the checkpoint.
+            for change in changes:
+                self.outstanding.pop(self.processor.action_key(*change), None)
+
+        return retry
+
+    def hold(self, changes, retry):
+        with self.lock:
+            self._hold(changes, retry)
+
+    def _hold(self, changes, retry):
+        pipe = self.processor.store.pipeline()
+        self.processor.hold(pipe, changes, retry)
+        pipe.execute()
+
+        for change in changes:
+            self.outstanding.pop(self.processor.action_key(*change), None)
+
+    def work(self):
+        while True:
+            _, _, name, partition = self.queue.get()
+
+            # Changes that fail are recorded through fail() and the rest of
+            #   the work carries on, anything else breaks off the project.
+            try:
+                self.processor.process_work(partition, self)
+            except Exception as e:
+                logger.exception(str(e))
+                broken = True
+            else:
+                broken = False
+
+            with self.lock:
+                finished = [partition]
+
+                # The rest of the project's work waits for the next poll so
+                #   that it still runs in order.
+                if broken:
+                    finished.extend(self.projects[name])
+                    self.projects[name].clear()
+                elif name in self.blocked:
+                    # The rest of the project's work is retried after the
+                    #   change that failed.
+                    for items in self.projects[name]:
+                        self._hold([change for item in items for change in item.changes], self.blocked[name])
+
+                    self.projects[name].clear()
+
+                for items in finished:
+                    for item in items:
+                        for change in item.changes:
+                            key = self.processor.action_key(*change)
+                            timestamp = self.outstanding.pop(key, None)
+
+                            if broken and timestamp is not None:
+                                self.deferred[key] = (timestamp, self.polls)
+
+                if self.projects[name]:
+                    self.put(name, self.projects[name].popleft())
+                else:
+                    del self.projects[name]
+
+            self.queue.task_done()
@@ -0,0 +1,244 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import BaseHTTPServer
+import bisect
+import collections
+import contextlib
+import logging
+import socket
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+_backends = []
+
+
+def incr(name, value=1, **labels):
+    for backend in _backends:
+        backend.incr(name, value, labels)
+
+
+def observe(name, value, **labels):
+    for backend in _backends:
+        backend.observe(name, value, labels)
+
+
+def gauge(name, value, **labels):
+    for backend in _backends:
+        backend.gauge(name, value, labels)
+
+
+@contextlib.contextmanager
+def timer(name, **labels):
+    """
+    Observes how long the block takes in the ``name`` histogram, and counts
+    the block raising in ``errors_total`` with a ``metric`` of ``name``.
+    """
+    if not _backends:
+        yield
+        return
+
+    start = time.time()
+
+    try:
+        yield
+    except Exception:
+        # Timers already use operation and method labels of their own
+        incr("errors_total", **dict(labels, metric=name))
+        raise
+    finally:
+        observe(name, time.time() - start, **labels)
+
+
+class Registry(object):
+    """
+    Aggregates counters, gauges and histograms in memory so they can be
+    rendered in the Prometheus text format.
+    """
+
+    def __init__(self, prefix="carrier", buckets=BUCKETS, *args, **kwargs):
+        super(Registry, self).__init__(*args, **kwargs)
+
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+
+        self.lock = threading.Lock()
+
+        self.counters = collections.defaultdict(float)
+        self.gauges = {}
+        self.histograms = {}
+
+    def _key(self, name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def incr(self, name, value, labels):
+        with self.lock:
+            self.counters[self._key(name, labels)] += value
+
+    def gauge(self, name, value, labels):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels):
+        key = self._key(name, labels)
+
+        with self.lock:
+            if key not in self.histograms:
+                # One count per bucket plus the overflow, then the sum
+                self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+
+            histogram = self.histograms[key]
+            histogram[bisect.bisect_left(self.buckets, value)] += 1
+            histogram[-1] += value
+
+    def _labels(self, labels, extra=()):
+        labels = list(labels) + list(extra)
+
+        if not labels:
+            return ""
+
+        escaped = [(k, unicode(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for k, v in labels]
+        return "{%s}" % ",".join(["%s=\"%s\"" % item for item in escaped])
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted([(key, list(value)) for key, value in self.histograms.items()])
+
+        lines = []
+        typed = set()
+
+        for kind, items in [("counter", counters), ("gauge", gauges)]:
+            for (name, labels), value in items:
+                name = "%s_%s" % (self.prefix, name)
+
+                if name not in typed:
+                    typed.add(name)
+                    lines.append("# TYPE %s %s" % (name, kind))
+
+                lines.append("%s%s %r" % (name, self._labels(labels), value))
+
+        for (name, labels), histogram in histograms:
+            name = "%s_%s" % (self.prefix, name)
+
+            if name not in typed:
+                typed.add(name)
+                lines.append("# TYPE %s histogram" % name)
+
+            cumulative = 0
+
+            for bound, count in zip(list(self.buckets) + ["+Inf"], histogram[:-1]):
+                cumulative += count
+                lines.append("%s_bucket%s %s" % (name, self._labels(labels, [("le", bound)]), cumulative))
+
+            lines.append("%s_sum%s %r" % (name, self._labels(labels), histogram[-1]))
+            lines.append("%s_count%s %s" % (name, self._labels(labels), cumulative))
+
+        return "\n".join(lines) + "\n"
+
+
+class _PrometheusHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PrometheusExporter(Registry):
+    """
+    A :class:`Registry` served at ``/metrics`` on ``host``:``port`` from a
+    background thread.
+    """
+
+    def __init__(self, host="0.0.0.0", port=9108, *args, **kwargs):
+        super(PrometheusExporter, self).__init__(*args, **kwargs)
+
+        self.server = BaseHTTPServer.HTTPServer((host, port), _PrometheusHandler)
+        self.server.registry = self
+
+        thread = threading.Thread(target=self.server.serve_forever, name="metrics")
+        thread.daemon = True
+        thread.start()
+
+
+class StatsDEmitter(object):
+    """
+    Sends every metric to a StatsD server over UDP as it is recorded. Label
+    values are appended to the metric name.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8125, prefix="carrier", *args, **kwargs):
+        super(StatsDEmitter, self).__init__(*args, **kwargs)
+
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _name(self, name, labels):
+        parts = [self.prefix, name] + [unicode(v).replace(".", "_") for k, v in sorted(labels.items())]
+        return ".".join([part for part in parts if part])
+
+    def _send(self, data):
+        try:
+            self.socket.sendto(data.encode("utf-8"), self.address)
+        except socket.error:
+            # Metrics must never break synchronization
+            logger.debug("Could not send '%s' to StatsD", data, exc_info=True)
+
+    def incr(self, name, value, labels):
+        self._send("%s:%s|c" % (self._name(name, labels), value))
+
+    def gauge(self, name, value, labels):
+        self._send("%s:%s|g" % (self._name(name, labels), value))
+
+    def observe(self, name, value, labels):
+        # Timers are in milliseconds, anything else is sent as a histogram
+        if name.endswith("_seconds"):
+            self._send("%s:%s|ms" % (self._name(name, labels), value * 1000))
+        else:
+            self._send("%s:%s|h" % (self._name(name, labels), value))
+
+
+def configure(config):
+    """
+    Sets up the exporters enabled in ``config["METRICS"]``.
+    """
+    options = config["METRICS"]
+
+    del _backends[:]
+
+    if options.get("PROMETHEUS") is not None:
+        prometheus = options["PROMETHEUS"]
+
+        try:
+            _backends.append(PrometheusExporter(prometheus.get("HOST", "0.0.0.0"), prometheus.get("PORT", 9108)))
+        except socket.error as e:
+            # Only one process can serve the endpoint, such as the parent of
+            #   the bulk import workers.
+            logger.warning("Not exporting metrics to Prometheus: %s", e)
+
+    if options.get("STATSD") is not None:
+        statsd = options["STATSD"]
+        _backends.append(StatsDEmitter(statsd.get("HOST", "127.0.0.1"), statsd.get("PORT", 8125), statsd.get("PREFIX", "carrier")))
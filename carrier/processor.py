@@ -4,117 +4,372 @@ from __future__ import unicode_literals
 
 import collections
 import datetime
-import hashlib
+import json
 import logging
-import re
+import threading
 import time
 import urlparse
 
+from multiprocessing.pool import ThreadPool
+
+from . import changelog
+from . import metrics
+from . import scheduling
 from .pypi import Package
 
 
 logger = logging.getLogger(__name__)
 
 
+# Number of synced releases to apply deletes and store the state for at once
+WRITE_BATCH_SIZE = 50
+
+
+Work = collections.namedtuple("Work", ["func", "name", "version", "timestamp", "action", "event", "changes"])
+
+
+class Progress(object):
+    """
+    Tracks which changes of a batch have completed so that ``pypi:since`` can
+    be moved up to the oldest change that hasn't while the batch is still
+    running, and records the changes that failed so they can be retried.
+    """
+
+    def __init__(self, processor, changes, since, *args, **kwargs):
+        super(Progress, self).__init__(*args, **kwargs)
+
+        self.processor = processor
+        self.store = processor.store
+        self.since = since
+
+        self.lock = threading.Lock()
+
+        self.pending = collections.Counter([change[2] for change in changes])
+        self.timestamps = sorted(self.pending)
+        self.position = 0
+
+    def _advance(self, pipe, changes):
+        for change in changes:
+            self.pending[change[2]] -= 1
+
+        start = self.position
+
+        while self.position < len(self.timestamps) and self.pending[self.timestamps[self.position]] <= 0:
+            self.position += 1
+
+        # Everything older than the first pending timestamp is done. Once
+        #   nothing is pending the final checkpoint takes over.
+        if self.position != start and self.position < len(self.timestamps):
+            if self.timestamps[self.position] > self.since:
+                self.since = self.timestamps[self.position]
+                pipe.set("pypi:since", self.since)
+
+                self.processor.lag(self.since)
+
+    def complete(self, changes):
+        with self.lock:
+            pipe = self.store.pipeline()
+
+            for change in changes:
+                pipe.hdel("pypi:failed", self.processor.action_key(*change))
+
+            self._advance(pipe, changes)
+
+            pipe.execute()
+
+    def fail(self, changes):
+        with self.lock:
+            pipe = self.store.pipeline()
+
+            retry = self.processor.record_failed(pipe, changes)
+
+            # Failed changes are retried from pypi:failed so they no longer
+            #   hold back the checkpoint.
+            self._advance(pipe, changes)
+
+            pipe.execute()
+
+        return retry
+
+    def hold(self, changes, retry):
+        with self.lock:
+            pipe = self.store.pipeline()
+
+            self.processor.hold(pipe, changes, retry)
+            self._advance(pipe, changes)
+
+            pipe.execute()
+
+
 class Processor(object):
 
-    def __init__(self, warehouse, pypi, store, *args, **kwargs):
+    def __init__(self, warehouse, pypi, store, pypi_workers=1, process_workers=1, session=None, cache=None, retries=10, backoff=60, pypi_batch=1, metadata=None, *args, **kwargs):
         super(Processor, self).__init__(*args, **kwargs)
 
         self.warehouse = warehouse
         self.pypi = pypi
         self.store = store
 
-    def get_and_update_or_create_version(self, release, project):
+        self.pypi_workers = pypi_workers
+        self.process_workers = process_workers
+        self.pypi_batch = pypi_batch
+
+        # Shared by every Package so connections to PyPI are kept alive
+        #   between projects.
+        self.session = session
+
+        # Optional on disk cache of downloaded distributions
+        self.cache = cache
+
+        # The threads every Package fetches on, starting a pool for each one
+        #   costs more than syncing a small project.
+        self._pypi_pool = None
+        self._pypi_pool_lock = threading.Lock()
+
+        # Optional cache of PyPI's responses, invalidated by the changelog
+        self.metadata = metadata
+
+        # How often, and how far apart, failed changes are retried
+        self.retries = retries
+        self.backoff = backoff
+
+        self.dispatch = {
+            changelog.CREATE: self.update,
+            changelog.RELEASE: self.update,
+            changelog.ADD_FILE: self.update,
+            changelog.REMOVE: self.delete,
+            changelog.REMOVE_FILE: self.delete,
+            changelog.UPDATE: self.update,
+            #changelog.DOCUPDATE: docupdate,  # @@@ Do Something
+            #changelog.ADD_ROLE: add_user_role,  # @@@ Do Something
+            #changelog.REMOVE_ROLE: remove_user_role,  # @@@ Do Something
+        }
+
+    @property
+    def pypi_pool(self):
+        if self.pypi_workers <= 1:
+            return None
+
+        with self._pypi_pool_lock:
+            if self._pypi_pool is None:
+                self._pypi_pool = ThreadPool(self.pypi_workers * self.process_workers)
+
+        return self._pypi_pool
+
+    def apply_changes(self, obj, data):
+        changed = False
+
+        for k, v in data.iteritems():
+            if getattr(obj, k, None) != v:
+                changed = True
+                setattr(obj, k, v)
+
+        return changed
+
+    def create_or_update_version(self, release, project, version=None):
         version_data = release.serialize()
         version_data.update({"project": project})
 
-        version, created = self.warehouse.versions.objects.get_or_create(project__name=project.name, version=release.version, show_yanked=True, defaults=version_data)
+        with metrics.timer("warehouse_request_seconds", operation="version"):
+            if version is None:
+                return self.warehouse.versions.objects.create(**version_data)
 
-        if not created:
             version.classifiers = sorted(version.classifiers)
 
-            changed = False
-
-            for k, v in version_data.iteritems():
-                if getattr(version, k, None) != v:
-                    changed = True
-                    setattr(version, k, v)
-
-            if changed:
+            if self.apply_changes(version, version_data):
                 version.save()
 
         return version
 
-    def get_and_update_or_create_file(self, release, version, distribution):
-        file_data = distribution.serialize()
+    def create_or_update_file(self, version, distribution, vfile=None, content=True):
+        file_data = distribution.serialize(content=content)
         file_data.update({"version": version})
 
-        vfile, created = self.warehouse.files.objects.get_or_create(filename=file_data["filename"], show_yanked=True, defaults=file_data)
+        if content:
+            metrics.incr("uploaded_bytes_total", distribution._size or 0)
 
-        if not created:
-            changed = False
+        with metrics.timer("warehouse_request_seconds", operation="file"):
+            if vfile is None:
+                return self.warehouse.files.objects.create(**file_data)
 
-            for k, v in file_data.iteritems():
-                if getattr(vfile, k, None) != v:
-                    changed = True
-                    setattr(vfile, k, v)
-
-            if changed:
+            if self.apply_changes(vfile, file_data):
                 vfile.save()
 
         return vfile
 
-    def update_files(self, release, version):
-        # Determine if any files need to be deleted
-        warehouse_files = set([f.filename for f in version.files])
-        local_files = set([x.filename for x in release.files])
-        deleted = warehouse_files - local_files
+    def changed_files(self, release, version, warehouse_files, fingerprints):
+        # Only download files whose content the warehouse does not already
+        #   have, files that PyPI only reports different metadata for are
+        #   updated without sending the content again.
+        changed = []
+
+        for distribution in release.files:
+            vfile = warehouse_files.get(distribution.filename)
+
+            if vfile is None:
+                changed.append(distribution)
+            elif fingerprints.get(distribution.filename) == distribution.fingerprint():
+                logger.debug("Skipping the file '%s' from '%s' version '%s' because it has not changed", distribution.filename, release.name, release.version)
+            elif (getattr(vfile, "digests", None) or {}).get("md5") == distribution._md5_digest:
+                logger.debug("Updating the metadata of the file '%s' from '%s' version '%s'", distribution.filename, release.name, release.version)
+                self.create_or_update_file(version, distribution, vfile, content=False)
+            else:
+                changed.append(distribution)
+
+        return changed
 
-        # Delete any files that need to be deleted
-        if deleted:
-            for filename in deleted:
-                logger.info("Deleting the file '%s' from '%s' version '%s'", filename, release.name, release.version)
+    def upload_files(self, release, version, warehouse_files, downloads):
+        for distribution in downloads:
+            try:
+                self.create_or_update_file(version, distribution, warehouse_files.get(distribution.filename))
+            finally:
+                distribution.close()
+
+        # Return the files that need to be deleted
+        return sorted(set(warehouse_files) - set([x.filename for x in release.files]))
+
+    def get_state(self, name, versions):
+        # Fetch the stored hash and file fingerprints of every version in a
+        #   single round trip.
+        if not versions:
+            return {}
+
+        pipe = self.store.pipeline(transaction=False)
+        pipe.hmget("pypi:process:%s" % name, versions)
+        pipe.hmget("pypi:process:%s:files" % name, versions)
+
+        with metrics.timer("redis_seconds", operation="get_state"):
+            hashes, fingerprints = pipe.execute()
+
+        state = {}
+
+        for version, release_hash, files in zip(versions, hashes, fingerprints):
+            state[version] = (release_hash, json.loads(files) if files is not None else {})
+
+        return state
+
+    def release_state(self, release):
+        # What is stored for a synced release, kept instead of the release
+        #   itself until it is written so its files can be freed.
+        fingerprints = dict([(f.filename, f.fingerprint()) for f in release.files])
+
+        return release.name, release.version, release.hash(), json.dumps(fingerprints)
 
-            self.warehouse.files.objects.filter(filename__in=deleted).delete()
+    def set_state(self, states):
+        pipe = self.store.pipeline()
 
-        return [self.get_and_update_or_create_file(release, version, distribution) for distribution in release.files]
+        for name, version, release_hash, fingerprints in states:
+            pipe.hset("pypi:process:%s" % name, version, release_hash)
+            pipe.hset("pypi:process:%s:files" % name, version, fingerprints)
 
-    def update(self, name, version=None, timestamp=None, action=None, matches=None, force=False):
-        package = Package(self.pypi, name, version)
+        with metrics.timer("redis_seconds", operation="set_state"):
+            pipe.execute()
+
+    def delete_state(self, name, version=None):
+        if version is None:
+            self.store.delete("pypi:process:%s" % name, "pypi:process:%s:files" % name)
+        else:
+            pipe = self.store.pipeline()
+            pipe.hdel("pypi:process:%s" % name, version)
+            pipe.hdel("pypi:process:%s:files" % name, version)
+            pipe.execute()
+
+    def update(self, name, version=None, timestamp=None, action=None, event=None, force=False):
+        package = Package(self.pypi, name, version, workers=self.pypi_workers, session=self.session, cache=self.cache, batch=self.pypi_batch, metadata=self.metadata, pool=self.pypi_pool)
 
         # Process the Name
-        project, _ = self.warehouse.projects.objects.get_or_create(name=name)
+        with metrics.timer("warehouse_request_seconds", operation="project"):
+            project, _ = self.warehouse.projects.objects.get_or_create(name=name)
 
-        for release in package.releases():
-            if "/" in release.version:
-                # We cannot accept versions with a / in it.
-                logger.error("Skipping '%s' version '%s' because it contains a '/'", release.name, release.version)
-                continue
+        # Newer versions are synced first, they are the ones people are waiting
+        #   on when a project has a long history to go through.
+        versions = scheduling.newest_first(package.versions())
+        state = self.get_state(name, versions)
 
-            if not release.changed(self.store.get("pypi:process:%s:%s" % (release.name, release.version))) and not force:
-                logger.info("Skipping '%s' version '%s' because it has not changed", release.name, release.version)
-                continue
+        # Fetch what the warehouse has for the project once and work out the
+        #   differences locally instead of looking up each version and file.
+        with metrics.timer("warehouse_request_seconds", operation="versions"):
+            if version is None:
+                existing = self.warehouse.versions.objects.filter(project__name=name, show_yanked=True)
+            else:
+                existing = self.warehouse.versions.objects.filter(project__name=name, version=version, show_yanked=True)
+
+            existing = dict([(v.version, v) for v in existing])
+
+        synced, deleted = [], []
+
+        def finish(release, version, warehouse_files, downloads):
+            for filename in self.upload_files(release, version, warehouse_files, downloads):
+                logger.info("Deleting the file '%s' from '%s' version '%s'", filename, release.name, release.version)
+                deleted.append(filename)
+
+            synced.append(self.release_state(release))
+
+            if len(synced) >= WRITE_BATCH_SIZE:
+                self.flush(synced, deleted)
+                del synced[:], deleted[:]
+
+        # A release's files are uploaded once the downloads of the next one
+        #   have started, so that they overlap when there are pypi workers.
+        uploading = None
+
+        try:
+            for release in package.releases(versions):
+                if "/" in release.version:
+                    # We cannot accept versions with a / in it.
+                    logger.error("Skipping '%s' version '%s' because it contains a '/'", release.name, release.version)
+                    continue
+
+                release_hash, fingerprints = state.get(release.version, (None, {}))
+
+                if not release.changed(release_hash) and not force:
+                    logger.info("Skipping '%s' version '%s' because it has not changed", release.name, release.version)
+                    continue
+
+                logger.info("Syncing '%s' version '%s'", release.name, release.version)
+
+                version = existing.get(release.version)
+                warehouse_files = dict([(f.filename, f) for f in version.files]) if version is not None else {}
+
+                version = self.create_or_update_version(release, project, version)
+
+                changed = self.changed_files(release, version, warehouse_files, fingerprints)
+                downloads = package.download_files(changed)
 
-            logger.info("Syncing '%s' version '%s'", release.name, release.version)
+                if uploading is not None:
+                    finish(*uploading)
 
-            version = self.get_and_update_or_create_version(release, project)
-            self.update_files(release, version)
+                uploading = (release, version, warehouse_files, downloads)
 
-            self.store.set("pypi:process:%s:%s" % (release.name, release.version), release.hash())
+            if uploading is not None:
+                finish(*uploading)
+        finally:
+            package.close()
 
-    def delete(self, name, version, timestamp, action, matches):
+        self.flush(synced, deleted)
+
+    def flush(self, synced, deleted):
+        # Deletes are sent to the warehouse in one request, and the state of
+        #   the synced releases is only stored once they have been applied.
+        if deleted:
+            with metrics.timer("warehouse_request_seconds", operation="delete_files"):
+                self.warehouse.files.objects.filter(filename__in=deleted).delete()
+
+        if synced:
+            self.set_state(synced)
+
+    def delete(self, name, version, timestamp, action, event):
         filename = None
 
-        if action == "remove":
+        if event.kind == changelog.REMOVE:
             if version is None:
                 obj = self.warehouse.projects.objects.filter(name=name)
                 logger.info("Deleting '%s'", name)
             else:
                 obj = self.warehouse.versions.objects.filter(project__name=name, version=version)
                 logger.info("Deleting '%s' version '%s'", name, version)
-        elif action.startswith("remove file"):
-            filename = matches.groups()[0]
+        elif event.kind == changelog.REMOVE_FILE:
+            filename = event.filename
             obj = self.warehouse.files.objects.filter(filename=filename)
             logger.info("Deleting '%s' version '%s' filename '%s'", name, version, filename)
         else:
@@ -125,71 +380,333 @@ class Processor(object):
         except obj.resource.DoesNotExist:
             return
 
-        if version is None:
-            key_pattern = "pypi:process:%s:*" % name
-            keys = self.store.keys(key_pattern)
-        else:
-            keys = ["pypi:process:%s:%s" % (name, version)]
-
-        for key in keys:
-            self.store.delete(key)
+        self.delete_state(name, version)
 
         obj.delete()
 
-    def process(self):
-        logger.info("Starting changed projects synchronization")
+    def action_key(self, name, version, timestamp, action):
+        return changelog.action_key(name, version, timestamp, action)
 
-        if not self.store.get("pypi:since"):
-            # This is the first time we've ran so we need to do a bulk import
-            raise RuntimeError(" Cannot process changes with no value for the last successful run.")
+    def match(self, action):
+        event = changelog.classify(action)
 
-        current = datetime.datetime.utcnow().replace(microsecond=0)
+        if event is None:
+            return None, None
+
+        return self.dispatch.get(event.kind), event
+
+    def coalesce(self, changes):
+        # Collapse the changes into one unit of work per (name, version). Every
+        #   update fetches the current state from PyPI so later updates to the
+        #   same version are redundant, and a remove supersedes any updates
+        #   that came before it.
+        work = []
+        pending = {}
+
+        for change in changes:
+            name, version, timestamp, action = change
+            func, event = self.match(action)
+
+            if func == self.update:
+                if (name, version) in pending:
+                    work[pending[(name, version)]].changes.append(change)
+                    continue
+
+                pending[(name, version)] = len(work)
+            elif event is not None and event.kind == changelog.REMOVE:
+                superseded = []
+
+                for key in list(pending):
+                    if key[0] == name and (version is None or key[1] == version):
+                        index = pending.pop(key)
+                        superseded.extend(work[index].changes)
+                        work[index] = None
+
+                work.append(Work(func, name, version, timestamp, action, event, superseded + [change]))
+                continue
+            elif event is not None and event.kind == changelog.REMOVE_FILE:
+                # Updates after the file was removed may bring it back, so they
+                #   have to run after the delete rather than be merged into
+                #   an update of the version or project from before it.
+                pending.pop((name, version), None)
+                pending.pop((name, None), None)
+
+            work.append(Work(func, name, version, timestamp, action, event, [change]))
+
+        return [item for item in work if item is not None]
+
+    def process_work(self, work, progress=None):
+        # Projects with a change that failed, mapped to when it is retried
+        blocked = {}
+
+        for item in work:
+            logdata = {"action": item.action, "name": item.name, "version": item.version, "timestamp": item.timestamp}
+            logger.debug(u"Processing %(name)s %(version)s %(timestamp)s %(action)s" % logdata)
+
+            # The project's later changes are retried after the failed one
+            if item.name in blocked:
+                progress.hold(item.changes, blocked[item.name])
+                continue
+
+            try:
+                if item.func is not None:
+                    # Whatever is cached for the project or version is stale.
+                    #   It is dropped only now so that an update which was
+                    #   still running when the change came in can't have put
+                    #   it back.
+                    if self.metadata is not None:
+                        self.metadata.invalidate(item.changes)
+
+                    item.func(item.name, item.version, item.timestamp, item.action, item.event)
+            except Exception:
+                if progress is None:
+                    raise
+
+                # Keep going with the rest of the batch, the failed changes
+                #   are retried with a later one.
+                logger.exception(u"Failed processing %(name)s %(version)s %(timestamp)s %(action)s" % logdata)
+                metrics.incr("changes_failed_total", len(item.changes))
+                retry = progress.fail(item.changes)
+
+                if retry is not None:
+                    blocked[item.name] = retry
+
+                continue
+
+            pipe = self.store.pipeline(transaction=False)
+
+            for change in item.changes:
+                pipe.setex(self.action_key(*change), 2592000, "1")
+
+            with metrics.timer("redis_seconds", operation="mark_processed"):
+                pipe.execute()
+
+            metrics.incr("changes_processed_total", len(item.changes))
 
-        since = int(float(self.store.get("pypi:since"))) - 10
+            if progress is not None:
+                progress.complete(item.changes)
 
-        dispatch = collections.OrderedDict([
-            (re.compile("^create$"), self.update),
-            (re.compile("^new release$"), self.update),
-            (re.compile("^add [\w\d\.]+ file .+$"), self.update),
-            (re.compile("^remove$"), self.delete),
-            (re.compile("^remove file (.+)$"), self.delete),
-            (re.compile("^update [\w]+(, [\w]+)*$"), self.update),
-            #(re.compile("^docupdate$"), docupdate),  # @@@ Do Something
-            #(re.compile("^add (Owner|Maintainer) .+$"), add_user_role),  # @@@ Do Something
-            #(re.compile("^remove (Owner|Maintainer) .+$"), remove_user_role),  # @@@ Do Something
-        ])
+    def partition(self, work):
+        # Partition the work by project so that each project's work is still
+        #   processed in timestamp order while different projects are
+        #   processed concurrently.
+        partitions = collections.OrderedDict()
 
-        changes = self.pypi.changelog(since)
+        for item in work:
+            partitions.setdefault(item.name, []).append(item)
+
+        return partitions
+
+    def prioritize(self, work):
+        # Moves the projects with new uploads ahead of the rest, each project's
+        #   own work stays in timestamp order.
+        return [item for partition in scheduling.order(self.partition(work).values()) for item in partition]
+
+    def process_partitioned(self, work, progress=None):
+        pool = ThreadPool(self.process_workers)
+
+        try:
+            results = []
+
+            for partition in self.partition(work).values():
+                results.append(pool.apply_async(self.process_work, (partition, progress)))
+
+            # Let every partition finish, each completed change is recorded as
+            #   it goes, before reporting the first failure.
+            pool.close()
+            pool.join()
+
+            for result in results:
+                result.get()
+        finally:
+            pool.terminate()
+
+    def changes(self, since):
+        with metrics.timer("pypi_request_seconds", method="changelog"):
+            changes = self.pypi.changelog(since)
 
         if changes:
             if isinstance(changes[0], basestring):
                 changes = [changes]
 
-        for name, version, timestamp, action in changes:
-            action_hash = hashlib.sha512(u":".join([unicode(x) for x in [name, version, timestamp, action]]).encode("utf-8")).hexdigest()[:32]
-            action_key = "pypi:changelog:%s" % action_hash
+        # Check which changes have already been processed in one round trip
+        pipe = self.store.pipeline(transaction=False)
 
-            logdata = {"action": action, "name": name, "version": version, "timestamp": timestamp}
+        for change in changes:
+            pipe.exists(self.action_key(*change))
 
-            if not self.store.exists(action_key):
-                logger.debug(u"Processing %(name)s %(version)s %(timestamp)s %(action)s" % logdata)
+        unprocessed = []
 
-                # Dispatch Based on the action
-                for pattern, func in dispatch.iteritems():
-                    matches = pattern.search(action)
-                    if matches is not None:
-                        func(name, version, timestamp, action, matches)
-                        break
+        with metrics.timer("redis_seconds", operation="check_processed"):
+            processed = pipe.execute()
 
-                self.store.setex(action_key, 2592000, "1")
-            else:
+        for (name, version, timestamp, action), processed in zip(changes, processed):
+            if processed:
+                logdata = {"action": action, "name": name, "version": version, "timestamp": timestamp}
                 logger.debug(u"Skipping %(name)s %(version)s %(timestamp)s %(action)s" % logdata)
+            else:
+                unprocessed.append((name, version, timestamp, action))
+
+        return sorted(unprocessed, key=lambda change: change[2])
+
+    def record_failed(self, pipe, changes):
+        # Schedules a retry of each change with an exponential backoff, or
+        #   moves it to pypi:failed:dead once it has been tried too often.
+        #   Returns when the last of them is retried, if any are.
+        keys = [self.action_key(*change) for change in changes]
+        previous = self.store.hmget("pypi:failed", keys) if keys else []
+
+        last_retry = None
+
+        for key, change, failure in zip(keys, changes, previous):
+            attempts = json.loads(failure)["attempts"] + 1 if failure else 1
+
+            if attempts > self.retries:
+                logger.error("Giving up on %s after %s attempts", change, attempts - 1)
+
+                pipe.hdel("pypi:failed", key)
+                pipe.hset("pypi:failed:dead", key, json.dumps(change))
+
+                # Handled as far as the changelog is concerned, so it isn't
+                #   picked up again with the changes around it.
+                pipe.setex(key, 2592000, "1")
+            else:
+                retry = time.time() + self.backoff * 2 ** (attempts - 1)
+                pipe.hset("pypi:failed", key, json.dumps({"change": change, "attempts": attempts, "retry": retry}))
+
+                last_retry = max(retry, last_retry)
+
+        return last_retry
+
+    def hold(self, pipe, changes, retry):
+        # Holds changes back in pypi:failed until ``retry``, when the failed
+        #   change of their project that they have to wait for is retried.
+        #   It doesn't count as an attempt.
+        keys = [self.action_key(*change) for change in changes]
+        previous = self.store.hmget("pypi:failed", keys) if keys else []
+
+        for key, change, failure in zip(keys, changes, previous):
+            attempts = json.loads(failure)["attempts"] if failure else 0
+            pipe.hset("pypi:failed", key, json.dumps({"change": change, "attempts": attempts, "retry": retry}))
 
+    def failed(self):
+        # Changes that failed during an earlier run, minus any that have been
+        #   processed since, split into those due to be retried and those
+        #   still backing off by their keys.
+        now = time.time()
+        failed = dict([(key, json.loads(failure)) for key, failure in self.store.hgetall("pypi:failed").iteritems()])
+
+        pipe = self.store.pipeline(transaction=False)
+
+        for key in failed:
+            pipe.exists(key)
+
+        due, waiting = [], {}
+
+        for (key, failure), processed in zip(failed.items(), pipe.execute()):
+            if processed:
+                self.store.hdel("pypi:failed", key)
+            elif failure["retry"] <= now:
+                due.append(tuple(failure["change"]))
+            else:
+                waiting[key] = failure
+
+        return due, waiting
+
+    def merge_failed(self, changes, running=()):
+        """
+        Adds the failed changes that are due to be retried to ``changes``.
+
+        The changes of a project that has a failed change still backing off
+        are held back until it is retried, so that they are still applied
+        after it. Changes whose keys are in ``running`` are left out.
+        """
+        due, waiting = self.failed()
+
+        keys = set([self.action_key(*change) for change in changes])
+        changes = sorted(changes + [change for change in due if self.action_key(*change) not in keys], key=lambda change: change[2])
+
+        # When each project with failed changes backing off retries the first
+        blocked = {}
+
+        for failure in waiting.values():
+            name = failure["change"][0]
+            blocked[name] = min(failure["retry"], blocked.get(name, failure["retry"]))
+
+        unprocessed, held = [], []
+
+        for change in changes:
+            key = self.action_key(*change)
+
+            if key in waiting or key in running:
+                continue
+
+            if change[0] in blocked:
+                held.append(change)
+            else:
+                unprocessed.append(change)
+
+        if due:
+            logger.info("Retrying %s failed changes", len(due))
+
+        if held:
+            logger.info("Holding back %s changes behind failed ones", len(held))
+
+            pipe = self.store.pipeline()
+
+            for name, retry in blocked.items():
+                self.hold(pipe, [change for change in held if change[0] == name], retry)
+
+            pipe.execute()
+
+        return unprocessed
+
+    def since(self):
+        if not self.store.get("pypi:since"):
+            # This is the first time we've ran so we need to do a bulk import
+            raise RuntimeError(" Cannot process changes with no value for the last successful run.")
+
+        return int(float(self.store.get("pypi:since"))) - 10
+
+    def lag(self, since):
+        # How far behind the changelog the last checkpoint is
+        metrics.gauge("changelog_lag_seconds", time.mktime(datetime.datetime.utcnow().timetuple()) - since)
+
+    def last_modified(self, current):
         # Hijack the warehouse session and url
         last_modified_url = urlparse.urljoin(self.warehouse.url, "/last-modified")
         resp = self.warehouse.session.post(last_modified_url, {"date": current.isoformat()})
         resp.raise_for_status()
 
+    def checkpoint(self, current):
+        self.last_modified(current)
+
         self.store.set("pypi:since", time.mktime(current.timetuple()))
 
+        self.lag(time.mktime(current.timetuple()))
+
+    def process(self):
+        logger.info("Starting changed projects synchronization")
+
+        since = self.since()
+
+        current = datetime.datetime.utcnow().replace(microsecond=0)
+
+        self.lag(since + 10)
+
+        unprocessed = self.merge_failed(self.changes(since))
+
+        work = self.prioritize(self.coalesce(unprocessed))
+
+        logger.info("Coalesced %s changes into %s units of work", len(unprocessed), len(work))
+
+        progress = Progress(self, unprocessed, since + 10)
+
+        if self.process_workers > 1:
+            self.process_partitioned(work, progress)
+        else:
+            self.process_work(work, progress)
+
+        self.checkpoint(current)
+
         logger.info("Finished changed projects synchronization")
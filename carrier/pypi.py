@@ -2,183 +2,338 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
-import base64
 import collections
 import hashlib
+import itertools
 import json
+import logging
+import tempfile
+
+from multiprocessing.pool import ThreadPool
 
 import requests
 
+from xmlrpc2.exceptions import Fault
+
+from . import metrics
 from .exceptions import HashMismatch
-from .utils import NormalizingDict, clean_uri, split_meta
+from .utils import clean_uri, split_meta
+
+
+logger = logging.getLogger(__name__)
+
+
+# Distributions are read from the network in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Distributions larger than this are spooled to disk instead of memory
+DOWNLOAD_SPOOL_SIZE = 4 * 1024 * 1024
+
+
+def _json_default(obj):
+    return obj.isoformat() if hasattr(obj, "isoformat") else obj
+
+
+def _faulted(result):
+    # system.multicall wraps each result in a list, or returns a fault struct
+    #   in its place if that call failed.
+    return isinstance(result, collections.Mapping) and "faultCode" in result
+
+
+def _close(resp):
+    # Drops the connection of a response that wasn't read to the end. Older
+    #   versions of requests only expose the underlying urllib3 response.
+    if hasattr(resp, "close"):
+        resp.close()
+    elif getattr(resp.raw, "_fp", None) is not None:
+        resp.raw._fp.close()
+
+
+_MISSING = object()
+
+
+def _pop(kwargs, key, default=None):
+    # Normalizes the value like NormalizingDict without copying kwargs first
+    value = kwargs.pop(key, default)
+
+    if not value or value in ("UNKNOWN", "None"):
+        value = default
+
+    return value
+
+
+class _lazy(object):
+    """
+    A field derived from the raw value PyPI gave for it, which is only worked
+    out the first time the field is read. The raw value is kept in the
+    ``_<name>_raw`` slot until then and the result in ``_<name>``.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.slot = "_%s" % func.__name__
+        self.raw = "_%s_raw" % func.__name__
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+
+        value = getattr(obj, self.slot)
+
+        if value is _MISSING:
+            value = self.func(obj, getattr(obj, self.raw))
+
+            setattr(obj, self.slot, value)
+            setattr(obj, self.raw, None)
+
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+        setattr(obj, self.raw, None)
 
 
 class File(object):
 
-    def __init__(self, *args, **kwargs):
-        kwargs = NormalizingDict(kwargs.items())
+    __slots__ = [
+        "comment", "filename", "type", "python_version", "created", "data", "digests",
+        "_downloads", "_has_sig", "_md5_digest", "_size", "_url", "_fingerprint",
+    ]
 
+    def __init__(self, *args, **kwargs):
         # Useful data
-        self.comment = kwargs.pop("comment_text")
-        self.filename = kwargs.pop("filename")
-        self.type = kwargs.pop("packagetype")
-        self.python_version = kwargs.pop("python_version")
-        self.created = kwargs.pop("upload_time")
-        self.data = kwargs.pop("file")
+        self.comment = _pop(kwargs, "comment_text")
+        self.filename = _pop(kwargs, "filename")
+        self.type = _pop(kwargs, "packagetype")
+        self.python_version = _pop(kwargs, "python_version")
+        self.created = _pop(kwargs, "upload_time")
+        self.data = _pop(kwargs, "file")
+        self.digests = _pop(kwargs, "digests")
 
         # PyPI internal data
-        self._downloads = kwargs.pop("downloads")
-        self._has_sig = kwargs.pop("has_sig")
-        self._md5_digest = kwargs.pop("md5_digest")
-        self._size = kwargs.pop("size")
-        self._url = kwargs.pop("url")
+        self._downloads = _pop(kwargs, "downloads")
+        self._has_sig = _pop(kwargs, "has_sig")
+        self._md5_digest = _pop(kwargs, "md5_digest")
+        self._size = _pop(kwargs, "size")
+        self._url = _pop(kwargs, "url")
+
+        self._fingerprint = None
 
         super(File, self).__init__(*args, **kwargs)
 
-    def serialize(self):
+    def serialize(self, content=True):
         data = {
-            "file": {
-                "name": self.filename,
-                "file": self.data,
-            },
             "created": self.created,
             "type": self.type,
             "python_version": self.python_version,
             "comment": self.comment,
             "filename": self.filename,
             "filesize": self._size,
-            "digests": {
-                "md5": hashlib.md5(base64.b64decode(self.data)).hexdigest(),
-                "sha256": hashlib.sha256(base64.b64decode(self.data)).hexdigest(),
-            },
         }
 
+        # Metadata only updates leave the content out entirely
+        if content:
+            # Make sure every payload starts at the beginning of the file
+            self.data.seek(0)
+
+            data.update({
+                "file": {
+                    "name": self.filename,
+                    "file": self.data,
+                },
+                "digests": dict(self.digests),
+            })
+
         return data
 
+    def fingerprint(self):
+        # Identifies the file's metadata and content using only what PyPI
+        #   reports about it, so it can be compared without a download.
+        if self._fingerprint is None:
+            data = [self.filename, self.created, self.type, self.python_version, self.comment, self._size, self._md5_digest]
+            data = json.dumps(data, default=_json_default)
 
-class Release(object):
+            self._fingerprint = hashlib.sha512(data).hexdigest()[:32]
 
-    def __init__(self, *args, **kwargs):
-        kwargs = NormalizingDict(kwargs.items())
+        return self._fingerprint
 
-        # Useful data
-        self.author = kwargs.pop("author", None)
-        self.author_email = kwargs.pop("author_email", None)
+    def close(self):
+        # Lets go of the downloaded content once it has been sent
+        if self.data is not None:
+            self.data.close()
+            self.data = None
 
-        self.classifiers = kwargs.pop("classifiers", [])
 
-        self.description = kwargs.pop("description", None)
+class Release(object):
 
-        self.keywords = kwargs.pop("keywords", "")
+    hash_version = 2
 
-        # Check for a comma
-        if "," in self.keywords:
-            self.keywords = [x.strip() for x in self.keywords.split(",")]
-        else:
-            self.keywords = [x.strip() for x in self.keywords.split()]
+    # The fields sent to the warehouse, and hashed to tell if a release changed
+    fields = [
+        "author", "author_email", "classifiers", "description", "keywords", "license",
+        "maintainer", "maintainer_email", "name", "platforms", "supported_platforms",
+        "requires_python", "summary", "version", "uris", "requires", "provides",
+        "obsoletes", "requires_external",
+    ]
 
-        self.license = kwargs.pop("license", None)
+    __slots__ = [
+        "author", "author_email", "classifiers", "description", "license", "maintainer",
+        "maintainer_email", "name", "requires_python", "summary", "version", "requires_external",
 
-        self.maintainer = kwargs.pop("maintainer", None)
-        self.maintainer_email = kwargs.pop("maintainer_email", None)
+        # Old and useless
+        "_old_requires", "_old_provides", "_old_obsoletes",
 
-        self.name = kwargs.pop("name", None)
+        # PyPI internal data
+        "_package_url", "_release_url", "_cheesecake_code_kwalitee_id",
+        "_cheesecake_documentation_id", "_cheesecake_installability_id",
+        "_pypi_hidden", "_pypi_ordering", "_stable_version",
 
-        self.platforms = kwargs.pop("platform", [])
+        "_hash",
 
-        if isinstance(self.platforms, basestring):
-            self.platforms = [self.platforms]
+        # The lazy fields and the raw values they are derived from
+        "_keywords", "_keywords_raw", "_platforms", "_platforms_raw",
+        "_supported_platforms", "_supported_platforms_raw", "_uris", "_uris_raw",
+        "_requires", "_requires_raw", "_provides", "_provides_raw",
+        "_obsoletes", "_obsoletes_raw", "_files", "_files_raw",
+    ]
 
-        self.supported_platforms = kwargs.pop("supported_platforms", [])
+    uri_labels = {"bugtrack_url": "Bug tracker", "home_page": "Home page", "download_url": "Download", "docs_url": "Documentation"}
 
-        if isinstance(self.supported_platforms, basestring):
-            self.supported_platforms = [self.supported_platforms]
+    def __init__(self, *args, **kwargs):
+        # Useful data
+        self.author = _pop(kwargs, "author", None)
+        self.author_email = _pop(kwargs, "author_email", None)
 
-        self.requires_python = kwargs.pop("requires_python", None)
+        self.classifiers = _pop(kwargs, "classifiers", [])
 
-        self.summary = kwargs.pop("summary", None)
+        self.description = _pop(kwargs, "description", None)
 
-        self.version = kwargs.pop("version", None)
+        self.license = _pop(kwargs, "license", None)
 
-        self.uris = {}
+        self.maintainer = _pop(kwargs, "maintainer", None)
+        self.maintainer_email = _pop(kwargs, "maintainer_email", None)
 
-        for key, label in {"bugtrack_url": "Bug tracker", "home_page": "Home page", "download_url": "Download", "docs_url": "Documentation"}.items():
-            uri = kwargs.pop(key, None)
+        self.name = _pop(kwargs, "name", None)
 
-            if uri is not None:
-                try:
-                    self.uris[label] = clean_uri(uri)
-                except ValueError:
-                    pass
+        self.requires_python = _pop(kwargs, "requires_python", None)
 
-        for purl in kwargs.pop("project_url", []):
-            label, uri = purl.split(",", 1)
+        self.summary = _pop(kwargs, "summary", None)
 
-            try:
-                self.uris[label] = clean_uri(uri)
-            except ValueError:
-                pass
+        self.version = _pop(kwargs, "version", None)
 
-        self.requires = [split_meta(req) for req in kwargs.pop("requires_dist", [])]
-        self.provides = [split_meta(req) for req in kwargs.pop("provides_dist", [])]
-        self.obsoletes = [split_meta(req) for req in kwargs.pop("obsoletes_dist", [])]
+        self.requires_external = _pop(kwargs, "requires_external", [])
 
-        self.requires_external = kwargs.pop("requires_external", [])
+        # Parsed when they are first used
+        self._keywords_raw = _pop(kwargs, "keywords", "")
+        self._platforms_raw = _pop(kwargs, "platform", [])
+        self._supported_platforms_raw = _pop(kwargs, "supported_platforms", [])
+        self._uris_raw = (dict([(key, _pop(kwargs, key, None)) for key in self.uri_labels]), _pop(kwargs, "project_url", []))
+        self._requires_raw = _pop(kwargs, "requires_dist", [])
+        self._provides_raw = _pop(kwargs, "provides_dist", [])
+        self._obsoletes_raw = _pop(kwargs, "obsoletes_dist", [])
+        self._files_raw = _pop(kwargs, "files", [])
 
-        self._files = [File(**x) for x in kwargs.pop("files", [])]
+        self._keywords = self._platforms = self._supported_platforms = self._uris = _MISSING
+        self._requires = self._provides = self._obsoletes = self._files = _MISSING
 
         # Old and useless
-        self._old_requires = kwargs.pop("requires", [])
-        self._old_provides = kwargs.pop("provides", [])
-        self._old_obsoletes = kwargs.pop("obsoletes", [])
+        self._old_requires = _pop(kwargs, "requires", [])
+        self._old_provides = _pop(kwargs, "provides", [])
+        self._old_obsoletes = _pop(kwargs, "obsoletes", [])
 
         # PyPI internal data
-        self._package_url = kwargs.pop("package_url", None)
-        self._release_url = kwargs.pop("release_url", None)
+        self._package_url = _pop(kwargs, "package_url", None)
+        self._release_url = _pop(kwargs, "release_url", None)
+
+        self._cheesecake_code_kwalitee_id = _pop(kwargs, "cheesecake_code_kwalitee_id", None)
+        self._cheesecake_documentation_id = _pop(kwargs, "cheesecake_documentation_id", None)
+        self._cheesecake_installability_id = _pop(kwargs, "cheesecake_installability_id", None)
 
-        self._cheesecake_code_kwalitee_id = kwargs.pop("cheesecake_code_kwalitee_id", None)
-        self._cheesecake_documentation_id = kwargs.pop("cheesecake_documentation_id", None)
-        self._cheesecake_installability_id = kwargs.pop("cheesecake_installability_id", None)
+        self._pypi_hidden = _pop(kwargs, "_pypi_hidden", None)
+        self._pypi_ordering = _pop(kwargs, "_pypi_ordering", None)
 
-        self._pypi_hidden = kwargs.pop("_pypi_hidden", None)
-        self._pypi_ordering = kwargs.pop("_pypi_ordering", None)
+        self._stable_version = _pop(kwargs, "stable_version", None)
 
-        self._stable_version = kwargs.pop("stable_version", None)
+        self._hash = None
 
         super(Release, self).__init__(*args, **kwargs)
 
-    @property
-    def files(self):
-        return self._files
+    @_lazy
+    def keywords(self, keywords):
+        # Check for a comma
+        if "," in keywords:
+            return [x.strip() for x in keywords.split(",")]
+        else:
+            return [x.strip() for x in keywords.split()]
 
-    def serialize(self):
-        data = {}
+    @_lazy
+    def platforms(self, platforms):
+        if isinstance(platforms, basestring):
+            platforms = [platforms]
+        return platforms
 
-        for key, value in self.__dict__.items():
-            if key.startswith("_"):
-                continue
-            data[key] = value
+    @_lazy
+    def supported_platforms(self, supported_platforms):
+        if isinstance(supported_platforms, basestring):
+            supported_platforms = [supported_platforms]
+        return supported_platforms
 
-        return data
+    @_lazy
+    def uris(self, raw):
+        urls, project_urls = raw
+        uris = {}
 
-    def hash(self):
-        def _dict_constant_data_structure(dictionary):
-            data = []
+        for key, label in self.uri_labels.items():
+            uri = urls[key]
 
-            for k, v in dictionary.items():
-                if isinstance(v, dict):
-                    v = _dict_constant_data_structure(v)
-                elif isinstance(v, set):
-                    v = sorted(v)
-                data.append([k, v])
+            if uri is not None:
+                try:
+                    uris[label] = clean_uri(uri)
+                except ValueError:
+                    pass
 
-            return sorted(data, key=lambda x: x[0])
+        for purl in project_urls:
+            label, uri = purl.split(",", 1)
 
-        data = self.serialize()
-        data["files"] = [f.serialize() for f in self.files]
-        data = json.dumps(_dict_constant_data_structure(data), default=lambda obj: obj.isoformat() if hasattr(obj, "isoformat") else obj)
+            try:
+                uris[label] = clean_uri(uri)
+            except ValueError:
+                pass
 
-        return hashlib.sha512(data).hexdigest()[:32]
+        return uris
+
+    @_lazy
+    def requires(self, requires):
+        return [split_meta(req) for req in requires]
+
+    @_lazy
+    def provides(self, provides):
+        return [split_meta(req) for req in provides]
+
+    @_lazy
+    def obsoletes(self, obsoletes):
+        return [split_meta(req) for req in obsoletes]
+
+    @_lazy
+    def files(self, files):
+        return [File(**x) for x in files]
+
+    def serialize(self):
+        return dict([(key, getattr(self, key)) for key in self.fields])
+
+    def hash(self):
+        # The hash is versioned so that changing how it is computed
+        #   invalidates every previously stored hash instead of comparing
+        #   against values made in a different way.
+        if self._hash is None:
+            with metrics.timer("release_hash_seconds"):
+                data = self.serialize()
+                data["files"] = sorted([f.fingerprint() for f in self.files])
+                data = json.dumps(data, sort_keys=True, default=_json_default)
+
+                self._hash = "%s:%s" % (self.hash_version, hashlib.sha512(data).hexdigest()[:32])
+
+        return self._hash
 
     def changed(self, other):
         return not self.hash() == other
@@ -186,44 +341,193 @@ class Release(object):
 
 class Package(object):
 
-    def __init__(self, client, package, version=None, *args, **kwargs):
+    def __init__(self, client, package, version=None, workers=1, session=None, cache=None, batch=1, metadata=None, pool=None, *args, **kwargs):
         super(Package, self).__init__(*args, **kwargs)
 
         self.client = client
         self.package = package
         self.version = version
+        self.workers = workers
+        self.cache = cache
+
+        # Number of versions to fetch the metadata of in one system.multicall
+        self.batch = batch
+
+        # Optional cache of the responses from PyPI
+        self.metadata = metadata
+
+        if session is None:
+            session = requests.session()
+
+        self.session = session
+
+        # The threads everything is fetched on when there are workers, a pool
+        #   given is shared with other packages and left running by close().
+        self._pool = pool
+        self._owns_pool = pool is None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
 
-        self.session = requests.session()
+        return self._pool
+
+    def close(self):
+        """
+        Stops the threads used to fetch the package once it has been synced.
+        """
+        if self._pool is not None and self._owns_pool:
+            self._pool.terminate()
+            self._pool = None
 
     def versions(self):
         if self.version is None:
-            versions = self.client.package_releases(self.package, True)
+            versions = self.metadata.releases(self.package) if self.metadata is not None else None
+
+            if versions is None:
+                with metrics.timer("pypi_request_seconds", method="package_releases"):
+                    versions = self.client.package_releases(self.package, True)
 
-            if isinstance(versions, basestring):
-                versions = [versions]
+                if isinstance(versions, basestring):
+                    versions = [versions]
+
+                if self.metadata is not None:
+                    self.metadata.set_releases(self.package, versions)
         else:
             versions = [self.version]
 
         return versions
 
-    def releases(self):
-        for version in self.versions():
-            item = self.client.release_data(self.package, version)
+    def release(self, version):
+        cached = self._cached([version])
+
+        if version in cached:
+            item, files = cached[version]
+        else:
+            with metrics.timer("pypi_request_seconds", method="release_data"):
+                item = self.client.release_data(self.package, version)
+
+            files = self.files(version) if item else []
+
+            if self.metadata is not None:
+                self.metadata.set(self.package, {version: (item, files)})
+
+        if not item:
+            return
+
+        return self._release(item, files)
+
+    def _cached(self, versions):
+        if self.metadata is None:
+            return {}
+
+        cached = self.metadata.get(self.package, versions)
+
+        metrics.incr("metadata_cache_hits_total", len(cached))
+        metrics.incr("metadata_cache_misses_total", len(versions) - len(cached))
+
+        return cached
+
+    def _release(self, item, files):
+        # fix classifiers
+        item["classifiers"] = sorted(set(item.get("classifiers", [])))
+
+        # Include the files
+        item["files"] = files
+
+        return Release(**item)
 
-            if not item:
-                continue
+    def batch_releases(self, versions):
+        """
+        Fetches the releases of ``versions`` with a single system.multicall,
+        falling back to calling PyPI for each version if it faults.
+        """
+        cached = self._cached(versions)
+        missing = [version for version in versions if version not in cached]
 
-            # fix classifiers
-            item["classifiers"] = sorted(set(item.get("classifiers", [])))
+        calls = []
 
-            # Include the files
-            item["files"] = self.files(version)
+        for version in missing:
+            calls.append({"methodName": "release_data", "params": [self.package, version]})
+            calls.append({"methodName": "release_urls", "params": [self.package, version]})
 
-            yield Release(**item)
+        if calls:
+            try:
+                with metrics.timer("pypi_request_seconds", method="system.multicall"):
+                    results = self.client("system.multicall", calls)
+            except Fault as e:
+                logger.warning("Fetching '%s' without system.multicall after: %s", self.package, e)
+                return [self.release(version) for version in versions]
+
+            fetched = {}
+
+            for version, item, urls in zip(missing, results[::2], results[1::2]):
+                if not _faulted(item) and not _faulted(urls):
+                    fetched[version] = (item[0], self._urls(urls[0]))
+
+            if self.metadata is not None:
+                self.metadata.set(self.package, fetched)
+
+            cached.update(fetched)
+
+        releases = []
+
+        for version in versions:
+            if version not in cached:
+                # Repeat the call on its own so it fails the way it would have
+                #   without batching.
+                releases.append(self.release(version))
+            elif cached[version][0]:
+                releases.append(self._release(*cached[version]))
+
+        return releases
+
+    def releases(self, versions=None):
+        if versions is None:
+            versions = self.versions()
+
+        if self.batch > 1:
+            versions = list(versions)
+            batches = [versions[i:i + self.batch] for i in xrange(0, len(versions), self.batch)]
+
+            if self.workers > 1:
+                releases = self._concurrently(self.batch_releases, batches)
+            else:
+                releases = (self.batch_releases(batch) for batch in batches)
+
+            releases = itertools.chain.from_iterable(releases)
+        elif self.workers > 1:
+            releases = self._concurrently(self.release, versions)
+        else:
+            releases = (self.release(version) for version in versions)
+
+        for release in releases:
+            if release is not None:
+                yield release
+
+    def _concurrently(self, func, items):
+        # Runs func over items on a pool of threads while still yielding the
+        #   results in the order of items. At most self.workers items are in
+        #   flight or waiting to be consumed at any one time.
+        pending = collections.deque()
+
+        for item in items:
+            pending.append(self.pool.apply_async(func, (item,)))
+
+            if len(pending) >= self.workers:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
 
     def files(self, version):
-        urls = self.client.release_urls(self.package, version)
+        with metrics.timer("pypi_request_seconds", method="release_urls"):
+            urls = self.client.release_urls(self.package, version)
+
+        return self._urls(urls)
 
+    def _urls(self, urls):
         if isinstance(urls, collections.Mapping):
             urls = [urls]
         elif isinstance(urls, collections.Iterable):
@@ -231,19 +535,80 @@ class Package(object):
         else:
             raise ValueError("Do not understand the type returned by release_urls")
 
-        files = []
+        return list(urls)
+
+    def download(self, distribution):
+        """
+        Streams the body of ``distribution`` into a temporary file, hashing
+        it as it goes, and attaches the file and its digests to it.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(distribution._md5_digest)
+
+            if cached is not None:
+                metrics.incr("download_cache_hits_total")
+
+                distribution.data, distribution.digests = cached
+                return distribution
+
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+
+        if self.cache is not None:
+            fp = self.cache.writer()
+        else:
+            fp = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_SIZE)
+
+        resp = None
+
+        try:
+            with metrics.timer("download_seconds"):
+                resp = self.session.get(distribution._url, prefetch=False)
+                resp.raise_for_status()
+
+                for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    md5.update(chunk)
+                    sha256.update(chunk)
+                    fp.write(chunk)
+        except Exception:
+            # Don't leave a partial download behind in the cache
+            self._discard(fp)
+
+            if resp is not None:
+                _close(resp)
 
-        for url in urls:
-            resp = self.session.get(url["url"], prefetch=True)
-            resp.raise_for_status()
+            raise
 
-            file_hash = hashlib.md5(resp.content)
+        metrics.incr("downloaded_bytes_total", fp.tell())
 
-            if url["md5_digest"] != file_hash.hexdigest():
-                raise HashMismatch("'MD5 hash {hash}' does not match the expected '{expected}' for {url}".format(hash=file_hash.hexdigest(), expected=url["md5_digest"], url=url["url"]))
+        if distribution._md5_digest != md5.hexdigest():
+            self._discard(fp)
 
-            url["file"] = base64.b64encode(resp.content)
+            raise HashMismatch("'MD5 hash {hash}' does not match the expected '{expected}' for {url}".format(hash=md5.hexdigest(), expected=distribution._md5_digest, url=distribution._url))
 
-            files.append(url)
+        if self.cache is not None:
+            fp = self.cache.commit(fp, md5.hexdigest())
+        else:
+            fp.seek(0)
+
+        distribution.data = fp
+        distribution.digests = {"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}
 
-        return files
+        return distribution
+
+    def _discard(self, fp):
+        if self.cache is not None:
+            self.cache.discard(fp)
+        else:
+            fp.close()
+
+    def download_files(self, files):
+        # Each file is yielded as soon as it has been downloaded so it can be
+        #   uploaded and closed before the rest of the release is fetched.
+        #   With workers the downloads all start straight away, so that they
+        #   run while the files of the previous release are being uploaded.
+        if self.workers > 1:
+            results = [self.pool.apply_async(self.download, (distribution,)) for distribution in files]
+            return (result.get() for result in results)
+
+        return (self.download(distribution) for distribution in files)
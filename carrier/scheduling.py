@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import re
+
+from . import changelog
+
+
+# Work is scheduled lowest number first. Changelog work for new uploads goes
+#   ahead of other changelog work such as metadata updates and removals, and
+#   everything from the changelog goes ahead of backfilling whole projects.
+NEW = 0
+CHANGE = 1
+BACKFILL = 2
+
+PRIORITIES = (NEW, CHANGE, BACKFILL)
+
+NAMES = {NEW: "new", CHANGE: "change", BACKFILL: "backfill"}
+
+# The events that mean something was uploaded
+_UPLOADS = frozenset([changelog.CREATE, changelog.RELEASE, changelog.ADD_FILE])
+
+_VERSION_PART = re.compile(r"\d+|[a-z]+")
+
+_DEV = "dev"
+_POST = frozenset(["post", "rev", "r"])
+
+
+def priority(item):
+    """
+    The priority of a unit of changelog work.
+    """
+    if item.event is not None and item.event.kind in _UPLOADS:
+        return NEW
+
+    return CHANGE
+
+
+def partition_priority(partition):
+    """
+    The priority of a project's work, that of its most urgent item.
+    """
+    return min([priority(item) for item in partition]) if partition else CHANGE
+
+
+def order(partitions):
+    """
+    Sorts the work of each project by its priority. Projects with the same
+    priority keep their order, so they still go oldest change first.
+    """
+    return sorted(partitions, key=partition_priority)
+
+
+def version_key(version):
+    """
+    A sort key that orders versions roughly by how new they are. It only
+    decides which versions are synced first, so anything it doesn't
+    understand just sorts by its numbers and letters.
+    """
+    key = []
+
+    for part in _VERSION_PART.findall(version.lower()):
+        if part.isdigit():
+            key.append((3, int(part)))
+        elif part in _POST:
+            key.append((2, part))
+        elif part == _DEV:
+            key.append((0, part))
+        else:
+            # Pre-releases such as a1, b2 and rc1
+            key.append((1, part))
+
+    # Marks the end of the version so that 1.0 comes after 1.0a1 and 1.0.dev1
+    #   but before 1.0.post1 and 1.0.1.
+    key.append((1.5,))
+
+    return key
+
+
+def newest_first(versions):
+    return sorted(versions, key=version_key, reverse=True)
@@ -0,0 +1,90 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import logging
+import time
+
+import requests
+
+from requests.exceptions import ConnectionError, Timeout
+
+from . import metrics
+from .utils import user_agent
+
+
+logger = logging.getLogger(__name__)
+
+
+class Session(requests.Session):
+    """
+    A :class:`requests.Session` that retries idempotent requests which fail
+    to connect, time out or hit a server error, backing off exponentially
+    between attempts.
+    """
+
+    retry_statuses = set([500, 502, 503, 504])
+
+    def __init__(self, retries=0, backoff=0, retry_methods=("GET", "HEAD", "OPTIONS"), name=None, *args, **kwargs):
+        super(Session, self).__init__(*args, **kwargs)
+
+        # Identifies the service the session talks to in metrics
+        self.name = name
+
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_methods = set([m.upper() for m in retry_methods])
+
+    def _request(self, method, url, *args, **kwargs):
+        with metrics.timer("http_request_seconds", service=self.name, method=method.upper()):
+            return super(Session, self).request(method, url, *args, **kwargs)
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() not in self.retry_methods:
+            return self._request(method, url, *args, **kwargs)
+
+        tried = 0
+        delay = self.backoff
+
+        while True:
+            tried += 1
+
+            try:
+                resp = self._request(method, url, *args, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                if tried > self.retries:
+                    raise
+
+                logger.warning("Retrying %s %s in %s seconds after: %s", method, url, delay, e)
+            else:
+                if resp.status_code not in self.retry_statuses or tried > self.retries:
+                    return resp
+
+                logger.warning("Retrying %s %s in %s seconds after a %s response", method, url, delay, resp.status_code)
+
+                # Read the body so the connection is returned to the pool
+                resp.content
+
+            metrics.incr("http_retries_total", service=self.name)
+
+            time.sleep(delay)
+            delay = delay * 2
+
+
+def session(config, pool_maxsize=None, **kwargs):
+    """
+    Builds a :class:`Session` using the connection pooling, timeout and retry
+    settings in ``config["HTTP"]``.
+    """
+    options = config["HTTP"]
+
+    kwargs.setdefault("headers", {}).setdefault("User-Agent", user_agent())
+    kwargs.setdefault("timeout", options["TIMEOUT"])
+
+    kwargs["config"] = {
+        "keep_alive": True,
+        "pool_connections": options["POOL_CONNECTIONS"],
+        "pool_maxsize": max(options["POOL_MAXSIZE"], pool_maxsize or 0),
+    }
+
+    return Session(retries=options["RETRIES"], backoff=options["BACKOFF"], **kwargs)
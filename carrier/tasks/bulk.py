@@ -4,6 +4,7 @@ from __future__ import unicode_literals
 
 import datetime
 import logging
+import multiprocessing
 import time
 
 from requests.exceptions import ConnectionError, HTTPError
@@ -14,16 +15,28 @@ from ..core import Carrier
 logger = logging.getLogger(__name__)
 
 
+# Each worker process builds a single Carrier and reuses it for every job
+_app = None
+
+
+def get_app():
+    global _app
+
+    if _app is None:
+        _app = Carrier()
+
+    return _app
+
+
 # We ignore the last component as we cannot properly handle it
 def get_jobs(last=0):
-    current = time.mktime(datetime.datetime.utcnow().timetuple())
-
-    print "Current time is", current
+    app = get_app()
 
-    app = Carrier()
+    done = app.processor.store.smembers("pypi:bulk:done")
 
-    for package in set(app.processor.pypi.list_packages()):
-        yield package
+    for package in sorted(set(app.processor.pypi.list_packages())):
+        if package.encode("utf-8") not in done:
+            yield package
 
 
 def handle_job(name):
@@ -31,12 +44,14 @@ def handle_job(name):
         tried = 0
         delay = 1
 
+        app = get_app()
+
         while True:
             try:
                 tried += 1
 
-                app = Carrier()
                 app.processor.update(name)
+                app.processor.store.sadd("pypi:bulk:done", name)
 
                 break
             except (ConnectionError, HTTPError):
@@ -50,3 +65,100 @@ def handle_job(name):
     except Exception as e:
         logger.exception(str(e))
         raise
+
+
+def _initialize_worker():
+    global _app
+
+    # Don't share the connections inherited from the parent process
+    _app = Carrier()
+
+
+def _run_job(name):
+    try:
+        handle_job(name)
+    except Exception:
+        return name, False
+    else:
+        return name, True
+
+
+def backfill():
+    # Leaves the projects to the consumers of the work queue, which sync them
+    #   in between the work coming in from the changelog and add them to
+    #   pypi:bulk:done as they go.
+    app = get_app()
+    store = app.processor.store
+
+    current = datetime.datetime.utcnow().replace(microsecond=0)
+    store.setnx("pypi:bulk:started", time.mktime(current.timetuple()))
+
+    # The producer follows the changelog from when the backfill started while
+    #   it runs, instead of only once it is done.
+    store.setnx("pypi:since", store.get("pypi:bulk:started"))
+
+    jobs = list(get_jobs())
+
+    if not jobs:
+        store.delete("pypi:bulk:started", "pypi:bulk:done")
+        logger.info("Finished bulk synchronization")
+        return True
+
+    # Run again to queue the packages that failed, and once everything has
+    #   been synchronized to finish up.
+    app.queue().backfill(jobs)
+
+    return True
+
+
+def bulk(workers=None, queue=False):
+    if queue:
+        return backfill()
+
+    app = get_app()
+    store = app.processor.store
+
+    if workers is None:
+        workers = app.config["BULK_WORKERS"]
+
+    # Remember when the first attempt started so that resumed runs still seed
+    #   pypi:since from before any of the packages were synchronized.
+    current = datetime.datetime.utcnow().replace(microsecond=0)
+    store.setnx("pypi:bulk:started", time.mktime(current.timetuple()))
+
+    jobs = list(get_jobs())
+    failed = []
+
+    logger.info("Starting bulk synchronization of %s packages with %s workers", len(jobs), workers)
+
+    pool = multiprocessing.Pool(workers, initializer=_initialize_worker)
+
+    try:
+        for i, (name, success) in enumerate(pool.imap_unordered(_run_job, jobs), 1):
+            if not success:
+                failed.append(name)
+
+            if i % 100 == 0:
+                logger.info("Synchronized %s of %s packages", i, len(jobs))
+
+    except (Exception, KeyboardInterrupt):
+        logger.info("Interrupted, run again to resume the bulk synchronization")
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+    if failed:
+        logger.error("Failed to synchronize %s packages, run again to retry them: %s", len(failed), ", ".join(failed))
+        return False
+
+    pipe = store.pipeline()
+    pipe.set("pypi:since", store.get("pypi:bulk:started"))
+    pipe.delete("pypi:bulk:started", "pypi:bulk:done")
+    pipe.execute()
+
+    logger.info("Finished bulk synchronization")
+
+    return True
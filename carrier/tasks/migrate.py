@@ -0,0 +1,114 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import json
+import logging
+
+from .. import scheduling
+from ..core import Carrier
+
+
+logger = logging.getLogger(__name__)
+
+
+# Converts the flat pypi:process:<name>:<version> and
+#   pypi:process:<name>:<version>:files keys into the per project
+#   pypi:process:<name> and pypi:process:<name>:files hashes.
+def migrate_process_keys(store, batch_size=1000):
+    migrated = 0
+
+    # Keys are removed while scanning, so keep scanning until a full pass
+    #   finds nothing left to migrate.
+    while True:
+        found = 0
+
+        for key in store.scan_iter(match="pypi:process:*:*", count=batch_size):
+            found += migrate_process_key(store, key)
+
+        if not found:
+            break
+
+        migrated += found
+
+    logger.info("Migrated %s keys", migrated)
+
+    return migrated
+
+
+def migrate_process_key(store, key):
+    name, rest = key.decode("utf-8")[len("pypi:process:"):].split(":", 1)
+
+    if rest == "files":
+        # Already a per project key
+        return 0
+
+    key_type = store.type(key)
+
+    if key_type == b"string":
+        version = rest
+        value = store.get(key)
+
+        pipe = store.pipeline()
+        pipe.hset("pypi:process:%s" % name, version, value)
+        pipe.delete(key)
+        pipe.execute()
+    elif key_type == b"hash" and rest.endswith(":files"):
+        version = rest[:-len(":files")]
+        fingerprints = dict([(k.decode("utf-8"), v.decode("utf-8")) for k, v in store.hgetall(key).items()])
+
+        pipe = store.pipeline()
+        pipe.hset("pypi:process:%s:files" % name, version, json.dumps(fingerprints))
+        pipe.delete(key)
+        pipe.execute()
+    else:
+        logger.warning("Skipping the unknown key '%s'", key)
+        return 0
+
+    return 1
+
+
+# Moves the work left in the single queue list used before work was queued by
+#   priority onto the list for ordinary changes, holding back all but the
+#   oldest item of each project.
+def migrate_queue(queue):
+    migrated = []
+
+    def _migrate(pipe):
+        items = pipe.lrange(queue.key, 0, -1)
+
+        if items:
+            pipe.multi()
+
+            active = set()
+            queued = []
+
+            # Oldest first, the producer pushed onto the other end
+            for raw in reversed(items):
+                name = json.loads(raw)["name"]
+
+                if name in active:
+                    pipe.rpush("%s:held:%s" % (queue.key, name), raw)
+                else:
+                    queued.insert(0, raw)
+                    pipe.set("%s:active:%s" % (queue.key, name), 1)
+                    active.add(name)
+
+            # They were queued first so they go on the end consumers take from
+            pipe.rpush(queue.queue_key(scheduling.CHANGE), *queued)
+            pipe.delete(queue.key)
+
+        migrated[:] = items
+
+    if queue.store.type(queue.key) == b"list":
+        queue.store.transaction(_migrate, queue.key)
+
+    logger.info("Migrated %s queued items", len(migrated))
+
+    return len(migrated)
+
+
+def migrate():
+    app = Carrier()
+    migrate_process_keys(app.processor.store)
+    migrate_queue(app.queue())
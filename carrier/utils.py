@@ -2,14 +2,21 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import collections
+import functools
 import platform
 import re
 import sys
+import threading
 import urlparse
 
 from . import __version__
 
 
+# Number of distinct requirements and urls to remember the parsed form of
+PARSE_CACHE_SIZE = 4096
+
+
 class NormalizingDict(dict):
 
     def pop(self, key, default=None):
@@ -19,6 +26,70 @@ class NormalizingDict(dict):
         return value
 
 
+def memoize(maxsize, exceptions=()):
+    """
+    Memoizes a function of hashable arguments in a thread safe cache of the
+    ``maxsize`` most recently used results. Raising one of ``exceptions`` is
+    remembered as well. Results are shared, so they must be immutable.
+    """
+    def decorator(func):
+        # A circular doubly linked list of [prev, next, key, result] links,
+        #   most recently used first, and a dict from key to link.
+        cache = {}
+        root = []
+        root[:] = [root, root, None, None]
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            with lock:
+                link = cache.get(args)
+
+                if link is not None:
+                    # Move the link to the front of the list
+                    link_prev, link_next, _, result = link
+                    link_prev[1], link_next[0] = link_next, link_prev
+                    first = root[1]
+                    first[0] = root[1] = link
+                    link[0], link[1] = root, first
+
+            if link is None:
+                try:
+                    result = (True, func(*args))
+                except exceptions as e:
+                    result = (False, (type(e), e.args))
+
+                with lock:
+                    if args not in cache:
+                        first = root[1]
+                        link = [root, first, args, result]
+                        first[0] = root[1] = cache[args] = link
+
+                        if len(cache) > maxsize:
+                            last = root[0]
+                            last[0][1] = root
+                            root[0] = last[0]
+                            del cache[last[2]]
+
+            returned, value = result
+
+            if not returned:
+                raise value[0](*value[1])
+
+            return value
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                root[:] = [root, root, None, None]
+
+        wrapper.uncached = func
+        wrapper.cache_clear = cache_clear
+
+        return wrapper
+    return decorator
+
+
 _PREDICATE = re.compile(r"(?i)^\s*(\w[\s\w-]*(?:\.\w*)*)(.*)")
 _VERSIONS = re.compile(r"^\s*\((?P<versions>.*)\)\s*$|^\s*(?P<versions2>.*)\s*$")
 _SPLIT_CMP = re.compile(r"^\s*(<=|>=|<|>|!=|==)\s*([^\s,]+)\s*$")
@@ -47,32 +118,9 @@ class VersionPredicate(object):
 
     def __init__(self, predicate):
         self._string = predicate
-        predicate = predicate.strip()
-        match = _PREDICATE.match(predicate)
-        if match is None:
-            raise ValueError('Bad predicate "%s"' % predicate)
-
-        name, predicates = match.groups()
-        self.name = name.strip()
-        self.predicates = []
-        if predicates is None:
-            return
-
-        predicates = _VERSIONS.match(predicates.strip())
-        if predicates is None:
-            return
-
-        predicates = predicates.groupdict()
-        if predicates['versions'] is not None:
-            versions = predicates['versions']
-        else:
-            versions = predicates.get('versions2')
-
-        if versions is not None:
-            for version in versions.split(','):
-                if version.strip() == '':
-                    continue
-                self.predicates.append(_split_predicate(version))
+        name, predicates = _parse_predicate(predicate)
+        self.name = name
+        self.predicates = list(predicates)
 
     def match(self, version):
         """Check if the provided version matches the predicates."""
@@ -87,17 +135,58 @@ class VersionPredicate(object):
         return self._string
 
 
-def split_meta(meta):
+@memoize(PARSE_CACHE_SIZE, exceptions=(ValueError,))
+def _parse_predicate(predicate):
+    predicate = predicate.strip()
+    match = _PREDICATE.match(predicate)
+    if match is None:
+        raise ValueError('Bad predicate "%s"' % predicate)
+
+    name, predicates = match.groups()
+    name = name.strip()
+    parsed = []
+    if predicates is None:
+        return name, ()
+
+    predicates = _VERSIONS.match(predicates.strip())
+    if predicates is None:
+        return name, ()
+
+    predicates = predicates.groupdict()
+    if predicates['versions'] is not None:
+        versions = predicates['versions']
+    else:
+        versions = predicates.get('versions2')
+
+    if versions is not None:
+        for version in versions.split(','):
+            if version.strip() == '':
+                continue
+            parsed.append(_split_predicate(version))
+
+    return name, tuple(parsed)
+
+
+Meta = collections.namedtuple("Meta", ["name", "version", "environment"])
+
+
+@memoize(PARSE_CACHE_SIZE, exceptions=(ValueError,))
+def _split_meta(meta):
     meta_split = meta.split(";", 1)
 
     vp = VersionPredicate(meta_split[0].strip())
     meta_env = meta_split[1].strip() if len(meta_split) == 2 else ""
 
-    return {
-        "name": vp.name,
-        "version": ",".join(["".join(p) for p in [(op if op != "==" else "", v) for op, v in vp.predicates]]),
-        "environment": meta_env,
-    }
+    return Meta(
+        name=vp.name,
+        version=",".join(["".join(p) for p in [(op if op != "==" else "", v) for op, v in vp.predicates]]),
+        environment=meta_env,
+    )
+
+
+def split_meta(meta):
+    # The parsed form is shared between callers, so hand out a copy
+    return dict(zip(Meta._fields, _split_meta(meta)))
 
 
 _url = re.compile(
@@ -110,6 +199,7 @@ _url = re.compile(
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
 
 
+@memoize(PARSE_CACHE_SIZE, exceptions=(ValueError,))
 def clean_uri(url):
     parts = list(urlparse.urlsplit(url))
 
@@ -0,0 +1,401 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from . import scheduling
+
+
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue(object):
+    """
+    A durable queue of changelog work kept in Redis, so that fetching the
+    changelog (:meth:`produce`) and processing it (:meth:`consume`) can run
+    in separate processes, on separate hosts.
+
+    Each item holds one project's changes. A consumer moves an item into
+    its own processing list while working on it and only removes it once
+    the work is done, so nothing is lost if it crashes; the items of a
+    consumer that stops sending heartbeats are put back on the queue by the
+    others. Failed items are retried with an exponential backoff and moved
+    to a dead letter list after too many attempts.
+
+    Only one item per project is out on the queue at a time, the ones queued
+    after it are held back in ``<key>:held:<name>`` until it is done, so a
+    project's changes are applied in order however they are prioritized and
+    retried.
+
+    The producer moves ``pypi:since`` on as soon as work is queued, but the
+    warehouse is only told it is up to date as of the oldest change still
+    in the queue.
+
+    There is a list for each priority and consumers always take from the
+    most urgent one that has work, so projects with new uploads are synced
+    ahead of other changes and of projects queued with :meth:`backfill`.
+    Backfills sync a project as it is at the time, they aren't held back.
+    """
+
+    def __init__(self, processor, key="pypi:queue", retries=5, backoff=30, heartbeat=30, timeout=300, consumer=None, *args, **kwargs):
+        super(WorkQueue, self).__init__(*args, **kwargs)
+
+        self.processor = processor
+        self.store = processor.store
+
+        self.key = key
+        self.retries = retries
+        self.backoff = backoff
+        self.heartbeat_interval = heartbeat
+        self.timeout = timeout
+
+        if consumer is None:
+            consumer = "%s:%s" % (socket.gethostname(), os.getpid())
+
+        self.consumer = consumer
+
+        # The date last sent to the warehouse as /last-modified
+        self.published = None
+
+        # The project lock currently held, refreshed by the heartbeat
+        self.locked = None
+
+    @property
+    def processing_key(self):
+        return "%s:processing:%s" % (self.key, self.consumer)
+
+    def queue_key(self, priority):
+        return "%s:%s" % (self.key, scheduling.NAMES[priority])
+
+    def _queue_key_for(self, raw):
+        # Items queued before there were priorities are ordinary changes
+        return self.queue_key(json.loads(raw).get("priority", scheduling.CHANGE))
+
+    def _id(self, item):
+        # Identifies an item across retries, backfills have no changes and
+        #   don't need to be told apart.
+        if not item["changes"]:
+            return None
+
+        return self.processor.action_key(*item["changes"][0])
+
+    def _active_key(self, name):
+        return "%s:active:%s" % (self.key, name)
+
+    def _held_key(self, name):
+        return "%s:held:%s" % (self.key, name)
+
+    def enqueue(self, item):
+        """
+        Queues a project's changes by their priority, or behind the item of
+        the project that is already out on the queue.
+        """
+        raw = json.dumps(item)
+        active_key = self._active_key(item["name"])
+
+        def _enqueue(pipe):
+            active = pipe.exists(active_key)
+
+            pipe.multi()
+
+            if active:
+                pipe.rpush(self._held_key(item["name"]), raw)
+            else:
+                pipe.lpush(self.queue_key(item["priority"]), raw)
+                pipe.set(active_key, 1)
+
+            pipe.zadd("%s:pending" % self.key, min([change[2] for change in item["changes"]]), self._id(item))
+
+            # Once queued the changes are handled as far as the changelog
+            #   is concerned.
+            for change in item["changes"]:
+                pipe.setex(self.processor.action_key(*change), 2592000, "1")
+
+        self.store.transaction(_enqueue, active_key)
+
+    def produce(self):
+        since = self.processor.since()
+
+        current = datetime.datetime.utcnow().replace(microsecond=0)
+
+        changes = self.processor.changes(since)
+        work = self.processor.coalesce(changes)
+
+        if work:
+            partitions = self.processor.partition(work)
+
+            for partition in scheduling.order(partitions.values()):
+                self.enqueue({
+                    "name": partition[0].name,
+                    "changes": [change for item in partition for change in item.changes],
+                    "attempts": 0,
+                    "priority": scheduling.partition_priority(partition),
+                })
+
+            logger.info("Queued %s changes for %s projects", len(changes), len(partitions))
+
+        self.store.set("pypi:since", time.mktime(current.timetuple()))
+
+        self.publish(current)
+
+    def publish(self, current):
+        # Only tell the warehouse it is up to date as of the oldest change
+        #   that hasn't been applied yet.
+        oldest = self.store.zrange("%s:pending" % self.key, 0, 0, withscores=True)
+
+        if oldest:
+            current = datetime.datetime.fromtimestamp(oldest[0][1])
+
+        if current != self.published:
+            self.processor.last_modified(current)
+            self.processor.lag(time.mktime(current.timetuple()))
+
+            self.published = current
+
+    def backfill(self, names, batch_size=1000):
+        """
+        Queues every project in ``names`` to be synced in full, behind any
+        work from the changelog. Each project is added to ``pypi:bulk:done``
+        once it has been synced.
+        """
+        names = list(names)
+
+        for i in xrange(0, len(names), batch_size):
+            items = [json.dumps({"name": name, "changes": [], "attempts": 0, "priority": scheduling.BACKFILL}) for name in names[i:i + batch_size]]
+            self.store.lpush(self.queue_key(scheduling.BACKFILL), *items)
+
+        logger.info("Queued %s projects to backfill", len(names))
+
+    def pop(self, timeout):
+        for priority in scheduling.PRIORITIES:
+            raw = self.store.rpoplpush(self.queue_key(priority), self.processing_key)
+
+            if raw is not None:
+                return raw
+
+        # Redis can only block on a single list, so only new uploads are
+        #   picked up straight away when the queue is empty, anything else
+        #   once the wait is over.
+        return self.store.brpoplpush(self.queue_key(scheduling.NEW), self.processing_key, timeout=timeout)
+
+    def consume(self, timeout=5):
+        """
+        Processes a single item from the queue, waiting up to ``timeout``
+        seconds for one. Returns ``False`` if there was nothing to do.
+        """
+        self.promote()
+
+        raw = self.pop(timeout)
+
+        if raw is None:
+            return False
+
+        item = json.loads(raw)
+
+        # Only one consumer may work on a project at a time so that its
+        #   changes are still applied in order.
+        lock_key = "%s:lock:%s" % (self.key, item["name"])
+
+        if not self.store.set(lock_key, self.consumer, nx=True, ex=self.timeout):
+            self.requeue(raw)
+            return True
+
+        self.locked = lock_key
+
+        try:
+            try:
+                if item.get("priority") == scheduling.BACKFILL:
+                    # Queued twice when a backfill was started again
+                    if not self.store.sismember("pypi:bulk:done", item["name"]):
+                        self.processor.update(item["name"])
+                else:
+                    self.processor.process_work(self.processor.coalesce([tuple(change) for change in item["changes"]]))
+            except Exception as e:
+                logger.exception(str(e))
+                self.retry(raw, item)
+            else:
+                if item.get("priority") == scheduling.BACKFILL:
+                    self.backfilled(raw, item)
+                else:
+                    self.done(raw, item)
+        finally:
+            self.locked = None
+            self.unlock(lock_key)
+
+        return True
+
+    def done(self, raw, item, extra=None):
+        """
+        Removes a finished item, running ``extra`` on the same transaction,
+        and lets the next held item of its project out on the queue.
+        """
+        name = item["name"]
+        keys = [self._active_key(name), self._held_key(name)] if item["changes"] else []
+
+        def _done(pipe):
+            following = pipe.lindex(self._held_key(name), 0) if keys else None
+
+            pipe.multi()
+            pipe.lrem(self.processing_key, 1, raw)
+
+            if extra is not None:
+                extra(pipe)
+
+            if keys:
+                pipe.zrem("%s:pending" % self.key, self._id(item))
+
+                # It has been waiting already, so it goes on the end that
+                #   consumers take from.
+                if following is not None:
+                    pipe.lpop(self._held_key(name))
+                    pipe.rpush(self._queue_key_for(following), following)
+                else:
+                    pipe.delete(self._active_key(name))
+
+        self.store.transaction(_done, *keys)
+
+    def backfilled(self, raw, item):
+        self.done(raw, item, lambda pipe: pipe.sadd("pypi:bulk:done", item["name"]))
+
+    def requeue(self, raw):
+        # Another consumer still holds the project, which only happens when
+        #   it was taken for dead or for a backfill, so the item goes to the
+        #   back of its list. It is the project's only item out on the queue
+        #   so nothing of the project can overtake it there.
+        pipe = self.store.pipeline()
+        pipe.lrem(self.processing_key, 1, raw)
+        pipe.lpush(self._queue_key_for(raw), raw)
+        pipe.execute()
+
+    def retry(self, raw, item):
+        item["attempts"] += 1
+
+        if item["attempts"] > self.retries:
+            logger.error("Giving up on '%s' after %s attempts", item["name"], item["attempts"])
+
+            dead = json.dumps(item)
+            self.done(raw, item, lambda pipe: pipe.lpush("%s:dead" % self.key, dead))
+        else:
+            self.delay(raw, item, self.backoff * 2 ** (item["attempts"] - 1))
+
+    def delay(self, raw, item, seconds):
+        # The project's later items stay held back while it waits
+        pipe = self.store.pipeline()
+        pipe.lrem(self.processing_key, 1, raw)
+        pipe.zadd("%s:delayed" % self.key, time.time() + seconds, json.dumps(item))
+        pipe.execute()
+
+    def promote(self):
+        delayed_key = "%s:delayed" % self.key
+
+        def _promote(pipe):
+            due = pipe.zrangebyscore(delayed_key, "-inf", time.time())
+
+            if due:
+                pipe.multi()
+                pipe.zrem(delayed_key, *due)
+
+                for raw in due:
+                    pipe.rpush(self._queue_key_for(raw), raw)
+
+        self.store.transaction(_promote, delayed_key)
+
+    def unlock(self, lock_key):
+        def _unlock(pipe):
+            if pipe.get(lock_key) == self.consumer.encode("utf-8"):
+                pipe.multi()
+                pipe.delete(lock_key)
+
+        self.store.transaction(_unlock, lock_key)
+
+    def heartbeat(self):
+        self.store.hset("%s:consumers" % self.key, self.consumer, time.time())
+
+        locked = self.locked
+
+        if locked is not None:
+            self.store.expire(locked, self.timeout)
+
+    def _heartbeat(self):
+        while True:
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.exception(str(e))
+
+            time.sleep(self.heartbeat_interval)
+
+    def recover(self):
+        """
+        Puts the items of consumers which have stopped sending heartbeats,
+        including a previous run of this one, back on the queue.
+        """
+        consumers_key = "%s:consumers" % self.key
+
+        for consumer, last_seen in self.store.hgetall(consumers_key).items():
+            consumer = consumer.decode("utf-8")
+
+            if consumer != self.consumer and time.time() - float(last_seen) < self.timeout:
+                continue
+
+            processing_key = "%s:processing:%s" % (self.key, consumer)
+
+            recovered = 0
+
+            # Each item goes back on the list for its priority, so look at it
+            #   before moving it.
+            def _recover(pipe):
+                raw = pipe.lindex(processing_key, -1)
+
+                if raw is not None:
+                    pipe.multi()
+                    pipe.rpoplpush(processing_key, self._queue_key_for(raw))
+
+            while self.store.transaction(_recover, processing_key):
+                recovered += 1
+
+            if recovered:
+                logger.warning("Recovered %s items from the consumer '%s'", recovered, consumer)
+
+            if consumer != self.consumer:
+                self.store.hdel(consumers_key, consumer)
+
+    def run_producer(self, interval=5):
+        while True:
+            started = time.time()
+
+            try:
+                self.produce()
+            except Exception as e:
+                logger.exception(str(e))
+
+            time.sleep(max(0, interval - (time.time() - started)))
+
+    def run_consumer(self):
+        # Heartbeats are sent from their own thread so that a long running
+        #   project doesn't make this consumer look like it has died.
+        heartbeat = threading.Thread(target=self._heartbeat)
+        heartbeat.daemon = True
+        heartbeat.start()
+
+        self.recover()
+
+        last_recovered = time.time()
+
+        while True:
+            try:
+                self.consume()
+
+                if time.time() - last_recovered > self.heartbeat_interval:
+                    self.recover()
+                    last_recovered = time.time()
+            except Exception as e:
+                logger.exception(str(e))
+                time.sleep(1)
@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from carrier.cache import FileCache
+
+
+class FileCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = FileCache(self.path, 25)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def add(self, data):
+        digest = hashlib.md5(data).hexdigest()
+
+        fp = self.cache.writer()
+        fp.write(data)
+        self.cache.commit(fp, digest).close()
+
+        return digest
+
+    def files(self):
+        return sorted([filename for _, _, filenames in os.walk(self.path) for filename in filenames])
+
+    def test_committed_file_is_cached(self):
+        fp = self.cache.writer()
+        fp.write(b"a" * 10)
+
+        data = self.cache.commit(fp, hashlib.md5(b"a" * 10).hexdigest())
+        self.assertEqual(data.read(), b"a" * 10)
+        data.close()
+
+        self.assertEqual(self.files(), [hashlib.md5(b"a" * 10).hexdigest()])
+
+        cached, digests = self.cache.get(hashlib.md5(b"a" * 10).hexdigest())
+        self.assertEqual(cached.read(), b"a" * 10)
+        self.assertEqual(digests, {"md5": hashlib.md5(b"a" * 10).hexdigest(), "sha256": hashlib.sha256(b"a" * 10).hexdigest()})
+        cached.close()
+
+    def test_discarded_file_is_removed(self):
+        fp = self.cache.writer()
+        fp.write(b"partial")
+
+        self.cache.discard(fp)
+
+        self.assertEqual(self.files(), [])
+
+    def test_missing_file(self):
+        self.assertEqual(self.cache.get(hashlib.md5(b"missing").hexdigest()), None)
+
+    def test_corrupted_file_is_removed(self):
+        digest = self.add(b"a" * 10)
+
+        with open(os.path.join(self.path, digest[:2], digest), "wb") as fp:
+            fp.write(b"b" * 10)
+
+        self.assertEqual(self.cache.get(digest), None)
+        self.assertEqual(self.files(), [])
+
+    def test_least_recently_used_files_are_evicted(self):
+        first = self.add(b"a" * 10)
+        second = self.add(b"b" * 10)
+
+        os.utime(os.path.join(self.path, first[:2], first), (1000, 1000))
+        os.utime(os.path.join(self.path, second[:2], second), (2000, 2000))
+
+        # Using the first file makes the second the least recently used
+        self.cache.get(first)[0].close()
+
+        third = self.add(b"c" * 10)
+
+        self.assertEqual(self.files(), sorted([first, third]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import unittest
+
+from carrier import changelog
+
+
+class ClassifyTests(unittest.TestCase):
+
+    def assertEvent(self, action, kind, filename=None, fields=()):
+        self.assertEqual(changelog.classify(action), changelog.Event(kind, filename, fields))
+
+    def test_create(self):
+        self.assertEvent("create", changelog.CREATE)
+
+    def test_new_release(self):
+        self.assertEvent("new release", changelog.RELEASE)
+
+    def test_add_file(self):
+        self.assertEvent("add source file foo-1.0.tar.gz", changelog.ADD_FILE, "foo-1.0.tar.gz")
+        self.assertEvent("add py2.py3 file foo-1.0-py2.py3-none-any.whl", changelog.ADD_FILE, "foo-1.0-py2.py3-none-any.whl")
+
+    def test_remove(self):
+        self.assertEvent("remove", changelog.REMOVE)
+
+    def test_remove_file(self):
+        self.assertEvent("remove file foo-1.0.zip", changelog.REMOVE_FILE, "foo-1.0.zip")
+
+    def test_update(self):
+        self.assertEvent("update summary", changelog.UPDATE, fields=("summary",))
+        self.assertEvent("update description, classifiers", changelog.UPDATE, fields=("description", "classifiers"))
+
+    def test_docupdate(self):
+        self.assertEvent("docupdate", changelog.DOCUPDATE)
+
+    def test_add_role(self):
+        self.assertEvent("add Owner bob", changelog.ADD_ROLE)
+        self.assertEvent("add Maintainer bob", changelog.ADD_ROLE)
+
+    def test_remove_role(self):
+        self.assertEvent("remove Owner bob", changelog.REMOVE_ROLE)
+        self.assertEvent("remove Maintainer bob", changelog.REMOVE_ROLE)
+
+    def test_removes_are_told_apart(self):
+        self.assertEqual(changelog.classify("remove").kind, changelog.REMOVE)
+        self.assertEqual(changelog.classify("remove file remove").kind, changelog.REMOVE_FILE)
+        self.assertEqual(changelog.classify("remove Owner file").kind, changelog.REMOVE_ROLE)
+
+    def test_unknown_actions(self):
+        for action in ["", "rename", "removed", "remove foo", "new release candidate", "add file foo-1.0.tar.gz", "update"]:
+            self.assertEqual(changelog.classify(action), None, action)
+
+
+class ActionKeyTests(unittest.TestCase):
+
+    def test_key_identifies_the_change(self):
+        key = changelog.action_key("foo", "1.0", 1000, "new release")
+
+        self.assertTrue(key.startswith("pypi:changelog:"))
+        self.assertEqual(key, changelog.action_key("foo", "1.0", 1000, "new release"))
+        self.assertNotEqual(key, changelog.action_key("foo", "1.0", 1001, "new release"))
+        self.assertNotEqual(key, changelog.action_key("foo", None, 1000, "new release"))
+
+    def test_key_of_a_unicode_action(self):
+        self.assertNotEqual(changelog.action_key("f\xf6\xf6", "1.0", 1000, "remove Owner b\xf6b"), changelog.action_key("foo", "1.0", 1000, "remove Owner bob"))
+
+
+if __name__ == "__main__":
+    unittest.main()
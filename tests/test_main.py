@@ -0,0 +1,35 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import unittest
+
+from carrier import __main__
+from carrier.tasks import bulk
+
+
+class BulkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.bulk = bulk.bulk
+
+    def tearDown(self):
+        bulk.bulk = self.bulk
+
+    def run_bulk(self, result):
+        bulk.bulk = lambda workers=None, queue=False: result
+
+        with self.assertRaises(SystemExit) as exited:
+            __main__.main(["bulk"])
+
+        return exited.exception.code
+
+    def test_exits_successfully_once_everything_is_synchronized(self):
+        self.assertEqual(self.run_bulk(True), 0)
+
+    def test_exits_with_an_error_when_packages_failed(self):
+        self.assertEqual(self.run_bulk(False), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import unittest
+
+from carrier import metrics
+
+
+class TimerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+        metrics._backends[:] = [self.registry]
+
+    def tearDown(self):
+        del metrics._backends[:]
+
+    def test_error_keeps_operation_label(self):
+        with self.assertRaises(IOError):
+            with metrics.timer("warehouse_request_seconds", operation="version"):
+                raise IOError("boom")
+
+        key = ("errors_total", (("metric", "warehouse_request_seconds"), ("operation", "version")))
+        self.assertEqual(self.registry.counters[key], 1)
+
+        histogram = self.registry.histograms[("warehouse_request_seconds", (("operation", "version"),))]
+        self.assertEqual(sum(histogram[:-1]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import json
+import unittest
+
+import fakeredis
+
+from carrier.processor import Processor
+from carrier.tasks.migrate import migrate_process_keys, migrate_queue
+from carrier.workqueue import WorkQueue
+
+
+class MigrateProcessKeysTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = fakeredis.FakeStrictRedis()
+        self.store.flushall()
+
+    def tearDown(self):
+        self.store.flushall()
+
+    def test_version_keys_are_moved_into_project_hashes(self):
+        self.store.set("pypi:process:foo:1.0", "hash-1.0")
+        self.store.set("pypi:process:foo:2.0", "hash-2.0")
+        self.store.hmset("pypi:process:foo:1.0:files", {"foo-1.0.tar.gz": "fingerprint"})
+
+        self.assertEqual(migrate_process_keys(self.store, batch_size=1), 3)
+
+        self.assertEqual(sorted(self.store.keys("pypi:process:*")), [b"pypi:process:foo", b"pypi:process:foo:files"])
+        self.assertEqual(self.store.hgetall("pypi:process:foo"), {b"1.0": b"hash-1.0", b"2.0": b"hash-2.0"})
+        self.assertEqual(json.loads(self.store.hget("pypi:process:foo:files", "1.0")), {"foo-1.0.tar.gz": "fingerprint"})
+
+    def test_migrated_keys_are_left_alone(self):
+        self.store.hset("pypi:process:foo", "1.0", "hash-1.0")
+        self.store.hset("pypi:process:foo:files", "1.0", json.dumps({"foo-1.0.tar.gz": "fingerprint"}))
+
+        self.assertEqual(migrate_process_keys(self.store), 0)
+
+        self.assertEqual(self.store.hgetall("pypi:process:foo"), {b"1.0": b"hash-1.0"})
+        self.assertEqual(self.store.hgetall("pypi:process:foo:files"), {b"1.0": json.dumps({"foo-1.0.tar.gz": "fingerprint"}).encode("utf-8")})
+
+    def test_running_again_does_nothing(self):
+        self.store.set("pypi:process:foo:1.0", "hash-1.0")
+
+        self.assertEqual(migrate_process_keys(self.store), 1)
+        self.assertEqual(migrate_process_keys(self.store), 0)
+
+        self.assertEqual(self.store.hgetall("pypi:process:foo"), {b"1.0": b"hash-1.0"})
+
+
+class MigrateQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = fakeredis.FakeStrictRedis()
+        self.store.flushall()
+
+        self.queue = WorkQueue(Processor(None, None, self.store), consumer="test")
+
+    def tearDown(self):
+        self.store.flushall()
+
+    def test_items_keep_their_order_per_project(self):
+        items = [json.dumps({"name": name, "changes": [[name, "1.0", timestamp, "new release"]], "attempts": 0}) for name, timestamp in [("a", 1001), ("b", 1002), ("a", 1003)]]
+
+        # The producer pushed them onto the front of the list
+        for item in items:
+            self.store.lpush("pypi:queue", item)
+
+        self.assertEqual(migrate_queue(self.queue), 3)
+
+        self.assertFalse(self.store.exists("pypi:queue"))
+        self.assertEqual(self.store.lrange("pypi:queue:change", 0, -1), [items[1].encode("utf-8"), items[0].encode("utf-8")])
+        self.assertEqual(self.store.lrange("pypi:queue:held:a", 0, -1), [items[2].encode("utf-8")])
+
+
+if __name__ == "__main__":
+    unittest.main()
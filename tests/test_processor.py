@@ -0,0 +1,211 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import json
+import time
+import unittest
+
+import fakeredis
+
+from carrier.processor import Processor, Progress
+
+
+class CoalesceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = Processor(None, None, None)
+
+    def summarize(self, work):
+        return [(item.func.__name__, item.version, [change[2] for change in item.changes]) for item in work]
+
+    def test_updates_to_a_version_are_merged(self):
+        work = self.processor.coalesce([
+            ("p", "1.0", 1, "new release"),
+            ("p", "1.0", 2, "add source file p-1.0.tar.gz"),
+            ("p", "1.0", 3, "update summary"),
+        ])
+
+        self.assertEqual(self.summarize(work), [("update", "1.0", [1, 2, 3])])
+
+    def test_remove_supersedes_earlier_updates(self):
+        work = self.processor.coalesce([
+            ("p", "1.0", 1, "new release"),
+            ("p", "1.0", 2, "remove"),
+        ])
+
+        self.assertEqual(self.summarize(work), [("delete", "1.0", [1, 2])])
+
+    def test_update_after_remove_file_runs_after_it(self):
+        work = self.processor.coalesce([
+            ("p", "1.0", 1, "add source file p-1.0.tar.gz"),
+            ("p", "1.0", 2, "remove file p-1.0.tar.gz"),
+            ("p", "1.0", 3, "add source file p-1.0.tar.gz"),
+        ])
+
+        self.assertEqual(self.summarize(work), [("update", "1.0", [1]), ("delete", "1.0", [2]), ("update", "1.0", [3])])
+
+    def test_project_update_after_remove_file_runs_after_it(self):
+        work = self.processor.coalesce([
+            ("p", None, 1, "create"),
+            ("p", "1.0", 2, "remove file p-1.0.tar.gz"),
+            ("p", None, 3, "create"),
+        ])
+
+        self.assertEqual(self.summarize(work), [("update", None, [1]), ("delete", "1.0", [2]), ("update", None, [3])])
+
+
+class ProgressTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = fakeredis.FakeStrictRedis()
+        self.store.flushall()
+
+        self.processor = Processor(None, None, self.store)
+        self.changes = [("a", "1.0", 1001, "new release"), ("b", "1.0", 1002, "new release"), ("c", "1.0", 1003, "new release")]
+        self.progress = Progress(self.processor, self.changes, 1000)
+
+    def tearDown(self):
+        self.store.flushall()
+
+    def since(self):
+        since = self.store.get("pypi:since")
+        return float(since) if since is not None else None
+
+    def test_since_waits_for_the_oldest_change(self):
+        self.progress.complete([self.changes[1]])
+        self.assertEqual(self.since(), None)
+
+        self.progress.complete([self.changes[0]])
+        self.assertEqual(self.since(), 1003)
+
+    def test_failed_changes_do_not_hold_back_since(self):
+        self.progress.fail([self.changes[0]])
+
+        self.assertEqual(self.since(), 1002)
+        self.assertTrue(self.store.hexists("pypi:failed", self.processor.action_key(*self.changes[0])))
+
+    def test_completing_a_retried_change_clears_its_failure(self):
+        self.progress.fail([self.changes[0]])
+
+        Progress(self.processor, [self.changes[0]], 1000).complete([self.changes[0]])
+
+        self.assertFalse(self.store.hexists("pypi:failed", self.processor.action_key(*self.changes[0])))
+
+
+class FailedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = fakeredis.FakeStrictRedis()
+        self.store.flushall()
+
+        self.processor = Processor(None, None, self.store, retries=2, backoff=10)
+        self.change = ("a", "1.0", 1001, "new release")
+        self.key = self.processor.action_key(*self.change)
+
+    def tearDown(self):
+        self.store.flushall()
+
+    def record_failed(self):
+        pipe = self.store.pipeline()
+        self.processor.record_failed(pipe, [self.change])
+        pipe.execute()
+
+    def failure(self):
+        return json.loads(self.store.hget("pypi:failed", self.key))
+
+    def test_attempts_and_backoff_are_recorded(self):
+        started = time.time()
+
+        self.record_failed()
+
+        failure = self.failure()
+        self.assertEqual(failure["change"], list(self.change))
+        self.assertEqual(failure["attempts"], 1)
+        self.assertTrue(started + 10 <= failure["retry"] <= time.time() + 10)
+
+        self.record_failed()
+
+        failure = self.failure()
+        self.assertEqual(failure["attempts"], 2)
+        self.assertTrue(started + 20 <= failure["retry"] <= time.time() + 20)
+
+    def test_gives_up_after_too_many_attempts(self):
+        for _ in range(3):
+            self.record_failed()
+
+        self.assertFalse(self.store.hexists("pypi:failed", self.key))
+        self.assertEqual(json.loads(self.store.hget("pypi:failed:dead", self.key)), list(self.change))
+
+        # Isn't picked up from the changelog again
+        self.assertTrue(self.store.exists(self.key))
+
+    def test_failed_splits_due_and_waiting_changes(self):
+        waiting = ("b", "1.0", 1002, "new release")
+        processed = ("c", "1.0", 1003, "new release")
+
+        for change, retry in [(self.change, time.time() - 1), (waiting, time.time() + 60), (processed, time.time() - 1)]:
+            self.store.hset("pypi:failed", self.processor.action_key(*change), json.dumps({"change": change, "attempts": 1, "retry": retry}))
+
+        self.store.set(self.processor.action_key(*processed), "1")
+
+        due, waiting_keys = self.processor.failed()
+
+        self.assertEqual(due, [self.change])
+        self.assertEqual(list(waiting_keys), [self.processor.action_key(*waiting)])
+        self.assertFalse(self.store.hexists("pypi:failed", self.processor.action_key(*processed)))
+
+
+class BrokenProcessor(Processor):
+
+    def __init__(self, *args, **kwargs):
+        super(BrokenProcessor, self).__init__(*args, **kwargs)
+
+        self.calls = []
+
+    def update(self, name, version=None, timestamp=None, action=None, event=None, force=False):
+        self.calls.append(("update", name, version))
+
+    def delete(self, name, version, timestamp, action, event):
+        raise ValueError("Broken %s" % name)
+
+
+class HoldTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = fakeredis.FakeStrictRedis()
+        self.store.flushall()
+
+        self.processor = BrokenProcessor(None, None, self.store, backoff=10)
+
+    def tearDown(self):
+        self.store.flushall()
+
+    def failure(self, change):
+        return json.loads(self.store.hget("pypi:failed", self.processor.action_key(*change)))
+
+    def test_later_changes_wait_for_a_failed_one(self):
+        remove = ("a", "1.0", 1001, "remove")
+        release = ("a", "1.0", 1002, "new release")
+        other = ("b", "1.0", 1003, "new release")
+
+        self.processor.process_work(self.processor.coalesce([remove, release, other]), Progress(self.processor, [remove, release, other], 1000))
+
+        self.assertEqual(self.processor.calls, [("update", "b", "1.0")])
+        self.assertEqual(self.failure(release)["attempts"], 0)
+        self.assertEqual(self.failure(release)["retry"], self.failure(remove)["retry"])
+
+    def test_merge_failed_holds_back_projects_with_waiting_failures(self):
+        remove = ("a", "1.0", 1001, "remove")
+        release = ("a", "1.0", 1002, "new release")
+        other = ("b", "1.0", 1003, "new release")
+
+        retry = time.time() + 60
+        self.store.hset("pypi:failed", self.processor.action_key(*remove), json.dumps({"change": remove, "attempts": 1, "retry": retry}))
+
+        self.assertEqual(self.processor.merge_failed([release, other]), [other])
+        self.assertEqual(self.failure(release)["retry"], retry)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import unittest
+
+from carrier import changelog
+from carrier import scheduling
+from carrier.processor import Work
+
+
+def work(name, action):
+    return Work(None, name, None, 0, action, changelog.classify(action), [])
+
+
+class VersionOrderTests(unittest.TestCase):
+
+    def assertOrdered(self, *versions):
+        self.assertEqual(sorted(versions, key=scheduling.version_key), list(versions))
+
+    def test_dev_releases_come_before_pre_releases(self):
+        self.assertOrdered("1.0.dev1", "1.0a1", "1.0b2", "1.0rc1", "1.0")
+
+    def test_post_releases_come_between_a_release_and_the_next(self):
+        self.assertOrdered("1.0", "1.0.post1", "1.0.1")
+
+    def test_release_candidate_comes_before_the_final_release(self):
+        self.assertOrdered("2.0rc1", "2.0", "2.0.1")
+
+    def test_numbers_are_compared_as_numbers(self):
+        self.assertOrdered("0.9", "1.0", "2.0", "10.0")
+
+    def test_newest_first(self):
+        versions = ["1.0", "1.0a1", "1.0.dev1", "1.0.post1", "1.0.1", "0.9", "2.0rc1", "10.0"]
+
+        self.assertEqual(scheduling.newest_first(versions), ["10.0", "2.0rc1", "1.0.1", "1.0.post1", "1.0", "1.0a1", "1.0.dev1", "0.9"])
+
+
+class PriorityTests(unittest.TestCase):
+
+    def test_uploads_are_new(self):
+        for action in ["create", "new release", "add source file foo-1.0.tar.gz"]:
+            self.assertEqual(scheduling.priority(work("foo", action)), scheduling.NEW, action)
+
+    def test_other_changes(self):
+        for action in ["remove", "remove file foo-1.0.tar.gz", "update summary", "docupdate", "unknown"]:
+            self.assertEqual(scheduling.priority(work("foo", action)), scheduling.CHANGE, action)
+
+    def test_order_keeps_projects_of_the_same_priority_in_order(self):
+        partitions = [[work("a", "remove")], [work("b", "new release")], [work("c", "update summary"), work("c", "create")], [work("d", "docupdate")]]
+
+        self.assertEqual([partition[0].name for partition in scheduling.order(partitions)], ["b", "c", "a", "d"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import unittest
+
+from carrier.utils import memoize
+
+
+class MemoizeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        @memoize(2, exceptions=(ValueError,))
+        def double(value):
+            self.calls.append(value)
+
+            if value < 0:
+                raise ValueError("Negative", value)
+
+            return value * 2
+
+        self.double = double
+
+    def test_results_are_cached(self):
+        self.assertEqual(self.double(1), 2)
+        self.assertEqual(self.double(1), 2)
+        self.assertEqual(self.calls, [1])
+
+    def test_least_recently_used_result_is_evicted(self):
+        self.double(1)
+        self.double(2)
+        self.double(3)
+
+        self.double(2)
+        self.double(3)
+        self.assertEqual(self.calls, [1, 2, 3])
+
+        self.double(1)
+        self.assertEqual(self.calls, [1, 2, 3, 1])
+
+    def test_hit_moves_result_to_the_front(self):
+        self.double(1)
+        self.double(2)
+
+        # 2 is now the least recently used and is evicted instead of 1
+        self.double(1)
+        self.double(3)
+
+        self.double(1)
+        self.assertEqual(self.calls, [1, 2, 3])
+
+        self.double(2)
+        self.assertEqual(self.calls, [1, 2, 3, 2])
+
+    def test_cached_exception_is_raised_again(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError) as raised:
+                self.double(-1)
+
+            self.assertEqual(raised.exception.args, ("Negative", -1))
+
+        self.assertEqual(self.calls, [-1])
+
+    def test_other_exceptions_are_not_cached(self):
+        @memoize(2, exceptions=(ValueError,))
+        def broken(value):
+            self.calls.append(value)
+            raise KeyError(value)
+
+        for _ in range(2):
+            with self.assertRaises(KeyError):
+                broken(1)
+
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_cache_clear(self):
+        self.double(1)
+        self.double.cache_clear()
+        self.double(1)
+
+        self.assertEqual(self.calls, [1, 1])
+
+        # The list is still usable after being cleared
+        self.double(2)
+        self.double(3)
+        self.double(1)
+        self.assertEqual(self.calls, [1, 1, 2, 3, 1])
+
+    def test_uncached(self):
+        self.assertEqual(self.double.uncached(1), 2)
+        self.assertEqual(self.double.uncached(1), 2)
+        self.assertEqual(self.calls, [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import json
+import time
+import unittest
+
+import fakeredis
+
+from carrier import scheduling
+from carrier.processor import Processor
+from carrier.workqueue import WorkQueue
+
+
+class FakePyPI(object):
+
+    def __init__(self):
+        self.log = []
+
+    def changelog(self, since):
+        return list(self.log)
+
+
+class RecordingProcessor(Processor):
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingProcessor, self).__init__(*args, **kwargs)
+
+        self.calls = []
+        self.broken = {}
+
+    def _call(self, func, name, version):
+        if self.broken.get(name):
+            self.broken[name] -= 1
+            raise ValueError("Broken %s" % name)
+
+        self.calls.append((func, name, version))
+
+    def update(self, name, version=None, timestamp=None, action=None, event=None, force=False):
+        self._call("update", name, version)
+
+    def delete(self, name, version, timestamp, action, event):
+        self._call("delete", name, version)
+
+    def last_modified(self, current):
+        pass
+
+
+class WorkQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = fakeredis.FakeStrictRedis()
+        self.store.flushall()
+        self.store.set("pypi:since", 1000)
+
+        self.pypi = FakePyPI()
+        self.processor = RecordingProcessor(None, self.pypi, self.store)
+        self.queue = WorkQueue(self.processor, retries=1, backoff=0, consumer="test")
+
+    def tearDown(self):
+        self.store.flushall()
+
+    def produce(self, *changes):
+        self.pypi.log = list(changes)
+        self.queue.produce()
+
+    def drain(self):
+        while self.queue.consume(timeout=1):
+            pass
+
+    def lists(self):
+        return dict([(key, self.store.lrange(key, 0, -1)) for key in self.store.keys("pypi:queue:*") if self.store.type(key) == b"list"])
+
+    def test_changes_are_processed(self):
+        self.produce(("a", "1.0", 1001, "new release"), ("b", "1.0", 1002, "update summary"))
+        self.drain()
+
+        self.assertEqual(self.processor.calls, [("update", "a", "1.0"), ("update", "b", "1.0")])
+        self.assertEqual(self.store.keys("pypi:queue:*"), [])
+        self.assertTrue(self.store.exists(self.processor.action_key("b", "1.0", 1002, "update summary")))
+
+    def test_new_uploads_go_first(self):
+        self.produce(("a", "1.0", 1001, "update summary"), ("b", "1.0", 1002, "new release"))
+        self.drain()
+
+        self.assertEqual(self.processor.calls, [("update", "b", "1.0"), ("update", "a", "1.0")])
+
+    def test_failed_item_is_retried_then_dead_lettered(self):
+        self.processor.broken["a"] = 2
+
+        self.produce(("a", "1.0", 1001, "new release"))
+
+        self.assertTrue(self.queue.consume(timeout=1))
+        self.assertEqual(self.store.zcard("pypi:queue:delayed"), 1)
+
+        self.drain()
+
+        self.assertEqual(self.processor.calls, [])
+
+        dead = [json.loads(raw) for raw in self.store.lrange("pypi:queue:dead", 0, -1)]
+        self.assertEqual([(item["name"], item["attempts"]) for item in dead], [("a", 2)])
+        self.assertEqual(self.store.keys("pypi:queue:*"), [b"pypi:queue:dead"])
+
+    def test_held_item_is_released_after_a_retry(self):
+        self.processor.broken["a"] = 1
+
+        self.produce(("a", "1.0", 1001, "remove"))
+        self.queue.consume(timeout=1)
+
+        self.produce(("a", "1.0", 1002, "new release"))
+        self.assertEqual(self.store.llen("pypi:queue:held:a"), 1)
+
+        self.drain()
+
+        self.assertEqual(self.processor.calls, [("delete", "a", "1.0"), ("update", "a", "1.0")])
+        self.assertEqual(self.store.keys("pypi:queue:*"), [])
+
+    def test_later_item_of_a_project_does_not_overtake_across_priorities(self):
+        self.produce(("a", "1.0", 1001, "remove"))
+        self.produce(("a", "1.0", 1002, "new release"))
+
+        self.assertEqual(self.store.llen(self.queue.queue_key(scheduling.NEW)), 0)
+
+        self.drain()
+
+        self.assertEqual(self.processor.calls, [("delete", "a", "1.0"), ("update", "a", "1.0")])
+
+    def test_item_of_a_locked_project_keeps_its_place(self):
+        self.store.set("pypi:queue:lock:a", "other")
+
+        self.produce(("a", "1.0", 1001, "remove"), ("b", "1.0", 1002, "update summary"))
+        self.queue.consume(timeout=1)
+
+        self.produce(("a", "1.0", 1003, "new release"))
+        self.queue.consume(timeout=1)
+
+        self.assertEqual(self.store.zcard("pypi:queue:delayed"), 0)
+        self.assertEqual(self.processor.calls, [("update", "b", "1.0")])
+
+        self.store.delete("pypi:queue:lock:a")
+        self.drain()
+
+        self.assertEqual(self.processor.calls, [("update", "b", "1.0"), ("delete", "a", "1.0"), ("update", "a", "1.0")])
+
+    def test_recover_requeues_the_items_of_a_dead_consumer(self):
+        new = json.dumps({"name": "a", "changes": [["a", "1.0", 1001, "new release"]], "attempts": 0, "priority": scheduling.NEW})
+        backfill = json.dumps({"name": "b", "changes": [], "attempts": 0, "priority": scheduling.BACKFILL})
+
+        self.store.lpush("pypi:queue:processing:dead", new, backfill)
+        self.store.hset("pypi:queue:consumers", "dead", time.time() - self.queue.timeout - 1)
+
+        self.queue.recover()
+
+        self.assertEqual(self.lists(), {
+            b"pypi:queue:new": [new.encode("utf-8")],
+            b"pypi:queue:backfill": [backfill.encode("utf-8")],
+        })
+        self.assertFalse(self.store.hexists("pypi:queue:consumers", "dead"))
+
+    def test_recover_leaves_live_consumers_alone(self):
+        raw = json.dumps({"name": "a", "changes": [], "attempts": 0, "priority": scheduling.BACKFILL})
+
+        self.store.lpush("pypi:queue:processing:alive", raw)
+        self.store.hset("pypi:queue:consumers", "alive", time.time())
+
+        self.queue.recover()
+
+        self.assertEqual(self.lists(), {b"pypi:queue:processing:alive": [raw.encode("utf-8")]})
+
+
+if __name__ == "__main__":
+    unittest.main()